@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+import os, sys, time, json, argparse, tempfile, tracemalloc, subprocess
+from warnings import filterwarnings
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from misfits import Spectrum, Spline, readfile, resample
+
+from misfits.tools.smooth import LowPass, Boxcar, Gaussian, SmoothingSpline
+from misfits.tools.error import RawSmooth
+from misfits.tools.velocity import Gaussians, Minima
+from misfits.tools.width import pEW, ShallowpEW
+from misfits.tools.uncertainty import MonteCarlo, Propagation
+
+filterwarnings('ignore')
+
+SIZES = 1000, 10000, 100000
+ITERATIONS = 20 # monte carlo realizations per benchmark run
+
+# rest wavelength, depth and width of the synthetic absorption lines
+LINES = (4500., .3, 30.), (5000., .5, 40.), (6100., .3, 60.)
+
+class Synthetic (object) :
+
+    def __init__(self, n, seed=0, noise=.02):
+
+        random = np.random.RandomState(seed)
+
+        self.wave = np.linspace(4000., 7000., n)
+        self.model = 1 + 1e-4 * (self.wave - 4000.)
+        for x0, depth, width in LINES:
+            self.model -= depth * np.exp(-(self.wave - x0)**2 / (2*width**2))
+
+        self.error = noise * np.ones(n)
+        self.flux = self.model + random.normal(0, noise, n)
+
+    def spectrum(self, error=True, smooth=True):
+
+        return Spectrum(self.wave, self.flux,
+                        self.error if error else None,
+                        self.model if smooth else None)
+
+STAGES = []
+
+def stage(name):
+
+    def _(f):
+        STAGES.append((name, f))
+        return f
+
+    return _
+
+def startup(code):
+
+    def _(synthetic, tmp):
+
+        # a fresh interpreter for every run, independent of the spectrum size
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + [os.environ.get('PYTHONPATH', '')]))
+        command = sys.executable, '-c', code
+
+        return lambda: subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+
+    return _
+
+stage('startup.headless')(startup('import sys; sys.argv = ["misfits", "--version"]; from misfits.scripts import misfits; misfits()'))
+stage('startup.gui')(startup('from misfits.tools import methods; [methods.get_gui(name) for name in methods.METHODS]'))
+
+@stage('readfile.ascii')
+def _(synthetic, tmp):
+
+    filename = os.path.join(tmp, 'spectrum.txt')
+    np.savetxt(filename, np.transpose([synthetic.wave, synthetic.flux]))
+
+    return lambda: readfile(filename)
+
+@stage('readfile.fits')
+def _(synthetic, tmp):
+
+    from astropy.io import fits
+
+    filename = os.path.join(tmp, 'spectrum.fits')
+    hdu = fits.PrimaryHDU(synthetic.flux)
+    hdu.header['crval1'] = synthetic.wave[0]
+    hdu.header['cdelt1'] = synthetic.wave[1] - synthetic.wave[0]
+    hdu.writeto(filename, overwrite=True)
+
+    return lambda: readfile(filename)
+
+def smoother(method):
+
+    def _(synthetic, tmp):
+
+        spectrum = synthetic.spectrum(smooth=False)
+
+        def run():
+            tool = method(spectrum)
+            spectrum.set_smooth(tool(**tool.auto()))
+
+        return run
+
+    return _
+
+stage('smooth.lowpass')(smoother(LowPass))
+stage('smooth.boxcar')(smoother(Boxcar))
+stage('smooth.gaussian')(smoother(Gaussian))
+
+@stage('smooth.smoothingspline')
+def _(synthetic, tmp):
+
+    spectrum = synthetic.spectrum(smooth=False)
+
+    return lambda: SmoothingSpline(spectrum)(flagged=[])
+
+@stage('error.rawsmooth')
+def _(synthetic, tmp):
+
+    spectrum = synthetic.spectrum(error=False)
+
+    def run():
+        tool = RawSmooth(spectrum)
+        spectrum.set_error(tool(**tool.auto()))
+
+    return run
+
+@stage('spline')
+def _(synthetic, tmp):
+
+    spectrum = synthetic.spectrum()
+
+    return lambda: Spline(spectrum).extrema
+
+@stage('resample')
+def _(synthetic, tmp):
+
+    spectrum = synthetic.spectrum()
+    wave = np.linspace(spectrum.wave[1], spectrum.wave[-2], spectrum.N // 2)
+
+    return lambda: resample(spectrum, wave)
+
+def gaussians(spectrum):
+
+    tool = Gaussians(spectrum)
+    tool.set_parameters(
+        limits = [(x0-4*width, x0+4*width) for x0, depth, width in LINES],
+        continuum = [[0, 1.] for line in LINES],
+        amplitudes = [[-depth] for x0, depth, width in LINES],
+        x0s = [[x0] for x0, depth, width in LINES],
+        stddevs = [[width] for x0, depth, width in LINES],
+        references = [[x0] for x0, depth, width in LINES],
+    )
+
+    return tool
+
+def minima(spectrum):
+
+    tool = Minima(spectrum)
+    tool.set_parameters(
+        limits = [(x0-4*width, x0+4*width) for x0, depth, width in LINES],
+        wavelengths = [[x0] for x0, depth, width in LINES],
+        references = [[x0] for x0, depth, width in LINES],
+    )
+
+    return tool
+
+def pew(spectrum):
+
+    tool = pEW(spectrum)
+    tool.set_parameters(
+        limits = [(x0-5*width, x0+5*width) for x0, depth, width in LINES],
+        maxima = [[(x0-4*width, x0+4*width)] for x0, depth, width in LINES],
+    )
+
+    return tool
+
+def shallowpew(spectrum):
+
+    tool = ShallowpEW(spectrum)
+    tool.set_parameters(
+        limits = [(x0-5*width, x0+5*width) for x0, depth, width in LINES],
+        continua = [[(x0-5*width, x0-4*width, x0+4*width, x0+5*width)] for x0, depth, width in LINES],
+    )
+
+    return tool
+
+def feature(method):
+
+    def _(synthetic, tmp):
+
+        tool = method(synthetic.spectrum())
+
+        return lambda: tool(**tool.get_parameters())
+
+    return _
+
+stage('velocity.gaussians')(feature(gaussians))
+stage('velocity.minima')(feature(minima))
+stage('width.pew')(feature(pew))
+stage('width.shallowpew')(feature(shallowpew))
+
+@stage('uncertainty.montecarlo')
+def _(synthetic, tmp):
+
+    tool = gaussians(synthetic.spectrum())
+
+    def run():
+        stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+        try:
+            MonteCarlo(tool.spectrum, tool, N=ITERATIONS, seed=0)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+    return run
+
+@stage('uncertainty.propagation')
+def _(synthetic, tmp):
+
+    tool = pew(synthetic.spectrum())
+
+    return lambda: Propagation(tool.spectrum, tool)
+
+def measure(run, repeat):
+
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(times), peak
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark the misfits pipeline stages on synthetic spectra')
+    parser.add_argument('--sizes', metavar='pixels', nargs='+', default=SIZES, type=int, help='spectrum sizes (default: %s)' % ' '.join(map(str, SIZES)))
+    parser.add_argument('--stages', metavar='stage', nargs='+', choices=[name for name, _ in STAGES], help='stages to run (default: all)')
+    parser.add_argument('--repeat', metavar='times', default=3, type=int, help='timed runs per stage, best is reported (default: 3)')
+    parser.add_argument('--baseline', metavar='filename', help='compare with results saved by --save')
+    parser.add_argument('--save', metavar='filename', help='save results as json')
+    parser.add_argument('--threshold', metavar='ratio', default=1.2, type=float, help='report slower than baseline above ratio (default: 1.2)')
+    args = parser.parse_args()
+
+    baseline = json.load(open(args.baseline)) if args.baseline else {}
+
+    results, slower = {}, []
+
+    print('%-24s %8s %12s %12s %10s %8s' % ('stage', 'pixels', 'time [ms]', 'Mpix/s', 'peak [MB]', 'ratio'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        for n in args.sizes:
+
+            synthetic = Synthetic(n)
+
+            for name, setup in STAGES:
+
+                if args.stages and not name in args.stages:
+                    continue
+
+                np.random.seed(0)
+                t, peak = measure(setup(synthetic, tmp), args.repeat)
+
+                key = '%s/%d' % (name, n)
+                results[key] = dict(time=t, peak=peak)
+
+                ratio = t / baseline[key]['time'] if key in baseline else np.nan
+                if ratio > args.threshold:
+                    slower.append(key)
+
+                print('%-24s %8d %12.2f %12.3f %10.2f %8.2f' % (name, n, 1e3*t, 1e-6*n/t, peak/2.**20, ratio))
+
+    if args.save:
+        json.dump(results, open(args.save, 'w'), indent=2)
+
+    if slower:
+        print('\nslower than baseline: %s' % ', '.join(slower))
+        sys.exit(1)
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import os, sys, argparse
+from warnings import filterwarnings
+
+import numpy as np
+
+from benchmark import Synthetic, gaussians, minima, pew, shallowpew
+
+from misfits import Spectrum
+from misfits.tools.smooth import LowPass
+from misfits.tools.uncertainty import MonteCarlo
+
+filterwarnings('ignore')
+
+SIZES = 1000, 10000
+REDSHIFTS = 0, .01
+
+# largest change of the mean and the stddev of each feature, in units of the stddev
+TOLERANCES = (
+    ('velocity.gaussians', gaussians, 5e-5, 5e-5),
+    ('velocity.minima', minima, 2e-3, 3e-3),
+    ('width.pew', pew, .1, .15),
+    ('width.shallowpew', shallowpew, 5e-5, 5e-5),
+)
+
+def statistics(synthetic, make, z, compact, N):
+
+    spectrum = Spectrum(synthetic.wave*(1+z), synthetic.flux, synthetic.error, synthetic.model, z, 0, compact)
+
+    smooth = LowPass(spectrum)
+    smooth(**smooth.auto())
+
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    try:
+        method = MonteCarlo(spectrum, make(spectrum), N=N, smooth=smooth, seed=0)
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+
+    return np.array([
+        [method.mean(i, j), method.std(i, j)] for i in range(len(method.data)) for j in range(method.len(i))
+    ])
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Check that compact spectra measure the features of double precision ones within tolerance')
+    parser.add_argument('--sizes', metavar='pixels', nargs='+', default=SIZES, type=int, help='spectrum sizes (default: %s)' % ' '.join(map(str, SIZES)))
+    parser.add_argument('-N', metavar='realizations', default=100, type=int, help='monte carlo realizations with the same seed (default: 100)')
+    args = parser.parse_args()
+
+    failed = []
+
+    print('%-20s %8s %6s %10s %10s %10s %10s' % ('feature', 'pixels', 'z', 'mean', 'tolerance', 'stddev', 'tolerance'))
+
+    for n in args.sizes:
+
+        synthetic = Synthetic(n)
+
+        for z in REDSHIFTS:
+
+            for name, make, mean, stddev in TOLERANCES:
+
+                a, b = (statistics(synthetic, make, z, compact, args.N) for compact in (False, True))
+                dmean, dstddev = np.max(np.abs(b - a) / a[:,1:], axis=0)
+
+                print('%-20s %8d %6.2f %10.1e %10.2g %10.1e %10.2g' % (name, n, z, dmean, mean, dstddev, stddev))
+
+                if dmean > mean or dstddev > stddev:
+                    failed.append('%s/%d/%g' % (name, n, z))
+
+    if failed:
+        print('\nover tolerance: %s' % ', '.join(failed))
+        sys.exit(1)
+
+if __name__ == '__main__':
+
+    main()
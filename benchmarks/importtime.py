@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+import os, sys, argparse, subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+HEAVY = 'scipy', 'astropy', 'matplotlib', 'tkinter'
+
+# statement, import budget in milliseconds and modules it must not import
+CHECKS = (
+    ('import misfits', 50, ('numpy',) + HEAVY),
+    ('from misfits import Spectrum, readfile', 300, HEAVY),
+    ('import misfits.scripts.misfits', 400, HEAVY),
+)
+
+def importtime(statement):
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + [os.environ.get('PYTHONPATH', '')]))
+    command = sys.executable, '-X', 'importtime', '-c', statement
+
+    output = subprocess.run(command, env=env, stderr=subprocess.PIPE, check=True).stderr.decode()
+
+    # import time: self [us] | cumulative [us] | module
+    modules = []
+    for line in output.splitlines():
+
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        t, cumulative, module = line[12:].split('|')
+        modules.append((int(t), module.strip()))
+
+    return sum(t for t, _ in modules) / 1e3, modules
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Check the import time of misfits against a budget with python -X importtime')
+    parser.add_argument('--repeat', metavar='times', default=5, type=int, help='runs per statement, best is reported (default: 5)')
+    parser.add_argument('--top', metavar='modules', default=5, type=int, help='slowest modules listed when over budget (default: 5)')
+    args = parser.parse_args()
+
+    failed = []
+
+    print('%-42s %10s %10s  %s' % ('statement', 'time [ms]', 'budget', 'forbidden imports'))
+
+    for statement, budget, forbidden in CHECKS:
+
+        t, modules = min((importtime(statement) for i in range(args.repeat)), key=lambda x: x[0])
+        imported = sorted(module for _, module in modules if module in forbidden)
+
+        print('%-42s %10.1f %10d  %s' % (statement, t, budget, ', '.join(imported) or '-'))
+
+        if t > budget or imported:
+            failed.append(statement)
+            for t, module in sorted(modules, reverse=True)[:args.top]:
+                print('    %8.1f ms  %s' % (t/1e3, module))
+
+    if failed:
+        print('\nover budget: %s' % ', '.join(failed))
+        sys.exit(1)
+
+if __name__ == '__main__':
+
+    main()
@@ -1,8 +1,39 @@
 __version__ = '1.0'
 
-from .file import readfile
-from .spectrum import Spectrum
-from .spline import Spline
+from importlib import import_module
 
 from .errors import *
-from .paramfuncs import *
+
+# submodules, and their dependencies, are imported on first use
+LAZY = {
+    'readfile' : 'file',
+    'readbatch' : 'file',
+    'Spectrum' : 'spectrum',
+    'SpectrumBatch' : 'batch',
+    'Cache' : 'cache',
+    'StageCache' : 'cache',
+    'SpectrumWriter' : 'writer',
+    'Spline' : 'spline',
+    'Pipeline' : 'pipeline',
+    'resample' : 'resampling',
+    'resample_batch' : 'resampling',
+    'get_parameters_from_header' : 'paramfuncs',
+    'update_parameter_header' : 'paramfuncs',
+}
+
+# names of a star import, the lazy ones are imported with it
+__all__ = list(LAZY) + ['SpectrumError', 'SplineError', 'WavelengthError', 'MethodError', 'FeatureError']
+
+def __getattr__(name):
+
+    if not name in LAZY:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+    value = getattr(import_module('.' + LAZY[name], __name__), name)
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+
+    return sorted(list(globals()) + list(LAZY))
@@ -0,0 +1,55 @@
+import numpy as np
+
+from .spectrum import Spectrum
+from .errors import SpectrumError
+
+class SpectrumBatch (object) :
+
+    def __init__(self, wave, flux, error=None, smooth=None, z=0, continuum_error=0, names=None):
+
+        self.flux = np.ascontiguousarray(flux, dtype=float)
+
+        if len(self.flux.shape) != 2:
+            raise SpectrumError('batch flux is not 2d')
+        elif not np.isfinite(self.flux).all():
+            raise SpectrumError('spectrum include non-finite number')
+
+        self.M, self.N = self.flux.shape
+
+        self.wave = self._stack(wave, 'wavelength grid')
+        self.error = self._stack(error, 'error spectrum') if not error is None else None
+        self.smooth = self._stack(smooth, 'smoothed spectrum') if not smooth is None else None
+
+        self.z = np.ascontiguousarray(np.broadcast_to(z, (self.M,)), dtype=float)
+        self.continuum_error = continuum_error
+
+        self.names = list(names) if not names is None else [str(i) for i in range(self.M)]
+
+    def _stack(self, data, name):
+
+        data = np.asarray(data, dtype=float)
+
+        # a common grid is shared by all spectra
+        if data.shape == (self.N,):
+            data = np.broadcast_to(data, (self.M, self.N))
+
+        if data.shape != (self.M, self.N):
+            raise SpectrumError('%s doesn\'t fit batch' % name)
+
+        return np.ascontiguousarray(data)
+
+    def __len__(self):
+
+        return self.M
+
+    def __getitem__(self, i):
+
+        error = self.error[i] if not self.error is None else None
+        smooth = self.smooth[i] if not self.smooth is None else None
+
+        return Spectrum(self.wave[i], self.flux[i], error, smooth, self.z[i], self.continuum_error)
+
+    def __iter__(self):
+
+        for i in range(self.M):
+            yield self[i]
@@ -0,0 +1,230 @@
+import os, io, json, hashlib, tempfile
+from collections import OrderedDict
+from ast import literal_eval
+
+import numpy as np
+
+from .file import readfile
+from .spectrum import Spectrum
+
+class Cache (object) :
+
+    SIZE = 2**30 # bytes kept in the cache directory
+
+    def __init__(self, directory, size=None):
+
+        self.directory = directory
+        self.size = size if not size is None else self.SIZE
+
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, filename):
+
+        stat = os.stat(filename)
+
+        # an unchanged file keeps its path, modification time and size
+        key = '%s:%d:%d' % (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def readfile(self, filename):
+
+        path = os.path.join(self.directory, self.key(filename))
+
+        try:
+            data = np.load(path + '.npy', mmap_mode='c') # copy-on-write, the entry is never modified
+            with open(path + '.txt') as fd:
+                header = literal_eval(fd.read())
+            os.utime(path + '.npy') # mark as recently used
+        except (IOError, OSError, ValueError, SyntaxError):
+            return self.store(path, *readfile(filename))
+
+        return Spectrum(*data), header
+
+    def store(self, path, spectrum, header):
+
+        # missing columns are stored as nan, which Spectrum reads back as None
+        data = spectrum._wave, spectrum.flux, spectrum._error, spectrum._smooth
+        data = np.array([c if not c is None else np.full(spectrum.N, np.nan) for c in data], dtype=float)
+
+        # the header is written first, data marks a complete entry
+        self._write(path + '.txt', lambda fd: fd.write(repr(header).encode()))
+        self._write(path + '.npy', lambda fd: np.save(fd, data))
+
+        self.evict()
+
+        return spectrum, header
+
+    def _write(self, filename, write):
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, filename)
+        except:
+            os.remove(tmp)
+            raise
+
+    def evict(self):
+
+        # all files of an entry share its key, the newest one marks its last use
+        entries = {}
+        for name in os.listdir(self.directory):
+
+            if name.endswith('.tmp'):
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+
+            mtime, size, filenames = entries.get(name.split('.')[0], (0, 0, []))
+            entries[name.split('.')[0]] = max(mtime, stat.st_mtime), size + stat.st_size, filenames + [name]
+
+        total = sum(size for _, size, _ in entries.values())
+
+        # least recently used entries are removed first
+        for _, size, filenames in sorted(entries.values()):
+
+            if total <= self.size:
+                break
+
+            for filename in filenames:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+            total -= size
+
+def _encode(value, arrays):
+
+    # json for the structure, arrays are stored next to it and referenced by index
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {'array': len(arrays) - 1}
+    elif isinstance(value, tuple):
+        return {'tuple': [_encode(v, arrays) for v in value]}
+    elif isinstance(value, list):
+        return [_encode(v, arrays) for v in value]
+    elif isinstance(value, dict):
+        return {'dict': [[_encode(k, arrays), _encode(v, arrays)] for k, v in value.items()]}
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    raise TypeError('can\'t cache %s' % type(value).__name__)
+
+def _decode(value, arrays):
+
+    if isinstance(value, list):
+        return [_decode(v, arrays) for v in value]
+    elif isinstance(value, dict) and 'array' in value:
+        return arrays['array%d' % value['array']]
+    elif isinstance(value, dict) and 'tuple' in value:
+        return tuple(_decode(v, arrays) for v in value['tuple'])
+    elif isinstance(value, dict):
+        return {_decode(k, arrays): _decode(v, arrays) for k, v in value['dict']}
+
+    return value
+
+def dumps(value):
+
+    arrays = []
+    structure = json.dumps(_encode(value, arrays))
+
+    fd = io.BytesIO()
+    np.savez(fd, structure=np.array(structure), **{'array%d' % i: a for i, a in enumerate(arrays)})
+
+    return fd.getvalue()
+
+def loads(data):
+
+    # nothing is unpickled, entries on disk may come from anyone who can write there
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        arrays = {k: npz[k] for k in npz.files}
+
+    return _decode(json.loads(str(arrays.pop('structure'))), arrays)
+
+class StageCache (object) :
+
+    SIZE = 2**28 # bytes kept in memory
+
+    def __init__(self, size=None, directory=None, disk_size=None):
+
+        self.size = size if not size is None else self.SIZE
+        self.entries, self.nbytes = OrderedDict(), 0
+
+        # optional second tier shared between processes and runs
+        self.disk = Cache(directory, disk_size) if not directory is None else None
+
+    def key(self, *items):
+
+        sha1 = hashlib.sha1()
+
+        for item in items:
+            if isinstance(item, np.ndarray):
+                sha1.update(repr((item.dtype.str, item.shape)).encode())
+                sha1.update(np.ascontiguousarray(item).data)
+            else:
+                sha1.update(repr(item).encode())
+            sha1.update(b'\0')
+
+        return sha1.hexdigest()
+
+    def get(self, key):
+
+        data = self.entries.get(key)
+
+        if not data is None:
+            self.entries.move_to_end(key)
+        elif not self.disk is None:
+            path = os.path.join(self.disk.directory, key + '.npz')
+            try:
+                with open(path, 'rb') as fd:
+                    data = fd.read()
+                os.utime(path)
+            except (IOError, OSError):
+                return None
+            self._put(key, data)
+        else:
+            return None
+
+        # entries are kept serialized, every hit is a fresh copy
+        try:
+            return loads(data)
+        except Exception: # unreadable entries are dropped and recomputed
+            self.nbytes -= len(self.entries.pop(key))
+            return None
+
+    def put(self, key, value):
+
+        try:
+            data = dumps(value)
+        except TypeError:
+            return
+
+        self._put(key, data)
+
+        if not self.disk is None:
+            self.disk._write(os.path.join(self.disk.directory, key + '.npz'), lambda fd: fd.write(data))
+            self.disk.evict()
+
+    def _put(self, key, data):
+
+        if key in self.entries:
+            self.nbytes -= len(self.entries.pop(key))
+
+        self.entries[key] = data
+        self.nbytes += len(data)
+
+        while self.nbytes > self.size and len(self.entries) > 1:
+            self.nbytes -= len(self.entries.popitem(last=False)[1])
+
+    def clear(self):
+
+        self.entries, self.nbytes = OrderedDict(), 0
@@ -1,36 +1,47 @@
+import os, io, gzip, warnings
 from ast import literal_eval
 
 import numpy as np
-from astropy.io import fits
 
 from .spectrum import Spectrum
-from .errors import WavelengthError
+from .batch import SpectrumBatch
+from .errors import SpectrumError, WavelengthError
 
-def readfile(f):
+BLOCKSIZE = 2**20 # bytes of ascii data parsed at once
 
-    fd = f if hasattr(f, 'seek') else open(f, 'rb')
+def readfile(f, cache=None):
+
+    # unchanged files are memory-mapped back from the cache
+    if not cache is None and not hasattr(f, 'seek'):
+        return cache.readfile(f)
+
+    fd = raw = f if hasattr(f, 'seek') else open(f, 'rb')
+
+    # compressed files are decompressed on the fly, never copied to disk
+    if is_gzip(raw):
+        raw.seek(0)
+        fd = gzip.GzipFile(fileobj=raw, mode='rb')
 
     if is_fits(fd):
 
+        from astropy.io import fits
+
         fd.seek(0)
 
-        with fits.open(fd) as hdul:
+        # data stays memory-mapped and is handed over without copies
+        with fits.open(fd, memmap=True) as hdul:
 
             if len(hdul[0].data.shape) == 1:
                 wave = get_wavelength(hdul)
                 data = [wave, hdul[0].data]
             else:
-                data = list(hdul[0].data)
+                data = hdul[0].data
 
-        header = {}
+            header = _get_fits_header(hdul[0])
 
     elif is_ascii(fd):
 
-        fd.seek(0)
-        data = np.loadtxt(fd, unpack=True)
-
-        fd.seek(0)
-        header = _get_header(fd)
+        data, header = read_ascii(fd)
 
     else:
 
@@ -38,12 +49,202 @@ def readfile(f):
 
     spectrum = Spectrum(*data)
 
-    if not fd is f:
+    if not fd is raw:
 
         fd.close()
 
+    if not raw is f:
+
+        raw.close()
+
     return spectrum, header
 
+def read_ascii(fd):
+
+    fd.seek(0)
+    header = _get_header(fd)
+    fd.seek(0)
+
+    chunks, columns, tail = [], None, b''
+
+    # whole lines are parsed block by block, the remainder is carried over
+    while True:
+
+        block = fd.read(BLOCKSIZE)
+        end = not block
+
+        if end:
+            block, tail = tail, b''
+        else:
+            block = tail + block
+            i = block.rfind(b'\n') + 1
+            block, tail = block[:i], block[i:]
+
+        block = _strip_comments(block) if b'#' in block else block
+
+        if block and not block.isspace():
+
+            chunks.append(_parse_block(block))
+
+            # every row has to match the first one, also across blocks
+            if chunks[-1].shape[1] != chunks[0].shape[1]:
+                raise ValueError('inconsistent number of columns')
+
+        if end:
+            break
+
+    if not chunks:
+        raise ValueError('no data in ascii file')
+
+    return np.ascontiguousarray(np.concatenate(chunks).T), header
+
+def _strip_comments(block):
+
+    parts, i = [], 0
+
+    while True:
+
+        j = block.find(b'#', i)
+
+        if j < 0:
+            break
+
+        parts.append(block[i:j])
+        i = block.find(b'\n', j)
+
+        if i < 0:
+            return b''.join(parts)
+
+    parts.append(block[i:])
+
+    return b''.join(parts)
+
+def _parse_block(block):
+
+    # rows of differing length raise a ValueError as they would for the whole file
+    return np.loadtxt(io.BytesIO(block), dtype=float, comments=None, ndmin=2)
+
+def readbatch(f, wave=None):
+
+    if isinstance(f, str) and os.path.isdir(f):
+        return _read_directory(f, wave)
+
+    fd = f if hasattr(f, 'seek') else open(f, 'rb')
+    name = f if not fd is f else getattr(f, 'name', '')
+
+    if not is_fits(fd):
+        raise IOError('unknown fileformat')
+
+    from astropy.io import fits
+
+    fd.seek(0)
+
+    with fits.open(fd, memmap=True) as hdul:
+
+        tables = [hdu for hdu in hdul if isinstance(hdu, fits.BinTableHDU)]
+        images = [hdu for hdu in hdul if hdu.is_image and not hdu.data is None]
+        headers = None
+
+        if not hdul[0].data is None and len(hdul[0].data.shape) == 2 and not 'crval1' in hdul[0].header:
+            # one spectrum per hdu as written by SpectrumWriter, rows of wavelength, flux, error and smooth
+            names = ['%s[%d]' % (name, i) for i in range(len(images))]
+            batch = _get_batch([Spectrum(*hdu.data) for hdu in images], names, wave)
+            headers = [_get_fits_header(hdu) for hdu in images]
+        elif not hdul[0].data is None and len(hdul[0].data.shape) == 2:
+            # one spectrum per row on a common grid
+            batch = SpectrumBatch(get_wavelength(hdul), hdul[0].data)
+        elif not hdul[0].data is None and len(hdul[0].data.shape) == 3:
+            # wavelength, flux, error and smooth rows for each spectrum
+            batch = SpectrumBatch(*[hdul[0].data[:,k] for k in range(hdul[0].data.shape[1])])
+        elif len(tables):
+            batch = SpectrumBatch(*_get_table_columns(tables[0]))
+        else:
+            raise IOError('unknown fileformat')
+
+    if not fd is f:
+
+        fd.close()
+
+    if headers is None:
+        batch.names = ['%s[%d]' % (name, i) for i in range(len(batch))]
+        headers = [{} for _ in range(len(batch))]
+
+    return batch, headers
+
+def _read_directory(directory, wave=None):
+
+    names = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name[0] != '.' and os.path.isfile(os.path.join(directory, name)))
+
+    # files that can't be read are skipped instead of failing the whole directory
+    spectra, headers, _names = [], [], []
+    for name in names:
+        try:
+            spectrum, header = readfile(name)
+        except (IOError, ValueError, SpectrumError, WavelengthError) as e:
+            warnings.warn('skipping %s: %s' % (name, e))
+            continue
+        spectra.append(spectrum)
+        headers.append(header)
+        _names.append(name)
+
+    if not spectra:
+        raise IOError('no readable spectra in %s' % directory)
+
+    return _get_batch(spectra, _names, wave), headers
+
+def _get_batch(spectra, names, wave=None):
+
+    # spectra on different grids are resampled onto the one given
+    if not wave is None:
+        from .resampling import resample_batch
+        return resample_batch(spectra, wave, names)
+
+    wave = spectra[0]._wave
+    if not all(np.array_equal(spectrum._wave, wave) for spectrum in spectra):
+        raise WavelengthError('spectra don\'t share a wavelength grid')
+
+    flux = [spectrum.flux for spectrum in spectra]
+    error = [spectrum._error for spectrum in spectra]
+    smooth = [spectrum._smooth for spectrum in spectra]
+
+    error = error if not any(e is None for e in error) else None
+    smooth = smooth if not any(s is None for s in smooth) else None
+
+    return SpectrumBatch(wave, flux, error, smooth, names=names)
+
+def _get_table_columns(table):
+
+    columns = {name.lower(): name for name in table.columns.names}
+    aliases = ('wave', 'wavelength'), ('flux',), ('error', 'err'), ('smooth',)
+
+    data = []
+    for alias in aliases:
+
+        column = next((columns[a] for a in alias if a in columns), None)
+
+        if column is None and len(data) < 2:
+            raise IOError('table doesn\'t include %s column' % alias[0])
+        elif column is None:
+            data.append(None)
+            continue
+
+        values = np.asarray(table.data[column], dtype=float)
+        data.append(values if len(values.shape) == 2 else values[None,:])
+
+    return data
+
+def _get_fits_header(hdu):
+
+    header, i = {}, 1
+
+    # parameters are stored as pairs of cards by SpectrumWriter
+    while 'MFKEY%d' % i in hdu.header:
+        header[hdu.header['MFKEY%d' % i]] = literal_eval(hdu.header['MFVAL%d' % i])
+        i += 1
+
+    return header
+
 def _get_header(fd):
 
     line = fd.readline().decode('ascii')
@@ -83,25 +284,39 @@ def get_wavelength(hdul):
 
     return b + np.arange(n) * a
 
+def is_gzip(fd):
+
+    fd.seek(0)
+
+    return fd.read(2) == b'\x1f\x8b'
+
 def is_fits(fd):
 
     fd.seek(0)
 
-    try:
-        hdul = fits.open(fd)
-        hdul[0].data
-    except:
-        return False
-    else:
-        return True
+    # mandatory first card of the primary header
+    card = fd.read(30)
+
+    return card[:9] == b'SIMPLE  =' and card[29:30] == b'T'
 
 def is_ascii(fd):
 
     fd.seek(0)
 
-    try:
-        np.loadtxt(fd, unpack=True)[1][1]
-    except:
-        return False
-    else:
-        return True
+    for line in fd:
+
+        try:
+            line = line.decode('ascii').split('#')[0].strip()
+        except UnicodeDecodeError:
+            return False
+
+        # comment lines, and comments after the values, are skipped as in read_ascii
+        if not line:
+            continue
+
+        try:
+            return len([float(value) for value in line.split()]) > 1
+        except ValueError:
+            return False
+
+    return False
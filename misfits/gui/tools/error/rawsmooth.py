@@ -2,9 +2,9 @@ from inspect import getframeinfo, currentframe
 
 import numpy as np
 
-from .... import get_parameters_from_header
 from ...plot import ErrorSnake
 from ....tools.error import RawSmooth
+from ....tools import methods
 
 def main(gui, spectrum, header):
     ''' - Error / Raw - Smooth
@@ -19,18 +19,13 @@ Adjust the smoothing of the error spectrum from the menu in the lower left corne
 To toggle data points in the residuals, click on individual points of the plot showing the absolute values of the residuals in the upper panel.
 Move the cursor to a panel and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = RawSmooth(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-        params = method.set_parameters(**params)
-    except KeyError:
-        params = method.auto()
-    spectrum.set_error(method(**params))
+    method = methods.error(RawSmooth, spectrum, header)
 
     if gui is None:
         return method
 
+    params = method.get_parameters()
+
     ax = (gui.add_subplot(211, zoomable='horizontal'),
                 gui.add_subplot(212, zoomable='horizontal'))
 
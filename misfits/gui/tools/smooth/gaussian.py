@@ -2,8 +2,8 @@ import numpy as np
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 from ....tools.smooth import Gaussian
+from ....tools import methods
 
 def main(gui, spectrum, header):
     ''' - Smooth / Gaussian
@@ -18,18 +18,13 @@ Use the cursor to adjust the FWHM of the Gaussian window.
 To toggle data points in the spectrum, click on individual flux points in the raw spectrum in the upper panel.
 Move the cursor to a panel and use the scrolling to zoom in and out and the middle button to center. When zooming in the upper panel, the lower panel will zoom along with it so they have the same scale.'''
 
-    method = Gaussian(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-        params = method.set_parameters(**params)
-    except KeyError:
-        params = method.auto()
-    spectrum.set_smooth(method(**params))
+    method = methods.smooth(Gaussian, spectrum, header)
 
     if gui is None:
         return method
 
+    params = method.get_parameters()
+
     ax = (gui.add_subplot(211, zoomable='horizontal'),
           gui.add_subplot(212, zoomable='horizontal'))
 
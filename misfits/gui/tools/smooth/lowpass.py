@@ -2,8 +2,8 @@ import numpy as np
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 from ....tools.smooth import LowPass
+from ....tools import methods
 
 def main(gui, spectrum, header):
     ''' - Smooth / Low-pass
@@ -21,14 +21,7 @@ Use the cursor to drag-and-drop the red cross in the lower panel to change the s
 To toggle data points in the spectrum, click on individual flux points in the raw spectrum in the upper panel.
 Move the cursor to a panel and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = LowPass(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-        params = method.set_parameters(**params)
-    except KeyError:
-        params = method.auto()
-    spectrum.set_smooth(method(**params))
+    method = methods.smooth(LowPass, spectrum, header)
 
     if gui is None:
         return method
@@ -2,9 +2,9 @@ import numpy as np
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 from ...plot import ErrorSnake
 from ....tools.smooth import SmoothingSpline
+from ....tools import methods
 
 def main(gui, spectrum, header):
     ''' - Smooth / Smoothing Spline
@@ -18,14 +18,7 @@ The lower panel shows the smoothed spectrum (black line) and the 1-sigma, 2-sigm
 To toggle data points in the spectrum, click on individual flux points in the raw spectrum in the upper panel.
 Move the cursor to a panel and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = SmoothingSpline(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-        params = method.set_parameters(**params)
-    except KeyError:
-        params = method.auto()
-    spectrum.set_smooth(method(**params))
+    method = methods.smooth(SmoothingSpline, spectrum, header)
 
     if gui is None:
         return method
@@ -6,8 +6,9 @@ from matplotlib import cm, gridspec
 
 from ...plot import ErrorSnake
 from ....tools.uncertainty import MonteCarlo
+from ....tools import methods
 
-def main(gui, spectrum, feature, output=None, N=1000, smooth=None):
+def main(gui, spectrum, feature, output=None, N=1000, smooth=None, workers=1, tolerance=None, streaming=False, seed=None):
     ''' - Uncertainty / Monte Carlo
 
 Remeasure features in N realizations of the spectrum.
@@ -16,12 +17,12 @@ The upper panel shows the spectrum (black line), the 1-sigma, 2-sigma and 3-sigm
 The lower panel(s) show the results with the color of each subplot's spine matching the markers in the upper panel. The red, green and blue vertical lines indicate 1-sigma, 2-sigma and 3-sigma, respectively of the histogram (gray bars) and approximated normal distribution shown (dashed black line).
 The buttons on the bottom changes between sections and quantitative results are printed beneath this text.'''
 
-    method = MonteCarlo(spectrum, feature, output, N, smooth)
+    method = methods.montecarlo(MonteCarlo, spectrum, feature, output, N, smooth, workers, tolerance, streaming, seed)
 
     if gui is None:
         return method
 
-    nintervals, bins = len(feature.limits), int(1 + 3.322*np.log10(N))
+    nintervals, bins = len(feature.limits), int(1 + 3.322*np.log10(method.iterations))
     locations = feature.locations() if hasattr(feature, 'locations') else None
     for i,(x0,xx) in enumerate(feature.limits):
 
@@ -49,10 +50,12 @@ The buttons on the bottom changes between sections and quantitative results are
             for spine in ax[-1].spines.values():
                 spine.set_edgecolor(color)
 
+            data, weights = method.data[i][j].sketch() if streaming else (method.data[i][j], None)
+
             try:
-                ax[-1].hist(method.data[i][j], bins, density=1, color='black', alpha=0.3)
+                ax[-1].hist(data, bins, weights=weights, density=1, color='black', alpha=0.3)
             except:
-                ax[-1].hist(method.data[i][j], bins, normed=1, color='black', alpha=0.3)
+                ax[-1].hist(data, bins, weights=weights, normed=1, color='black', alpha=0.3)
 
             if not len(method.data[i][j]):
                 continue
@@ -6,6 +6,7 @@ from matplotlib import cm, gridspec
 
 from ...plot import ErrorSnake
 from ....tools.uncertainty import Propagation
+from ....tools import methods
 
 def main(gui, spectrum, feature, output, *args, **kwargs):
     ''' - Uncertainty / Propagation
@@ -16,7 +17,7 @@ The upper panel shows the spectrum (black line), the 1-sigma, 2-sigma and 3-sigm
 The lower panel(s) show the results with the color of each subplot's spine matching the markers in the upper panel. The red, green and blue vertical lines indicate 1-sigma, 2-sigma and 3-sigma, respectively of the normal distribution (dashed black line).
 The buttons on the bottom changes between sections and quantitative results are printed beneath this text.'''
 
-    method = Propagation(spectrum, feature, output)
+    method = methods.propagation(Propagation, spectrum, feature, output)
 
     if gui is None:
         return method
@@ -9,8 +9,6 @@ if version_info.major == 3:
 else:
     import tkMessageBox as messagebox
 
-from .... import get_parameters_from_header
-
 from ..base.intervals import BaseIntervals
 from ..base.interval import BaseInterval
 from ..base.functions import BaseLabelContinuumFunctions
@@ -19,6 +17,7 @@ from ..base.variable import BaseVariable, BaseLabelVariable
 from ..base.label import BaseFloatLabel
 
 from ....tools.velocity import Gaussians
+from ....tools import methods
 
 class PositionAmplitudeVariable (BaseLabelVariable) :
 
@@ -251,16 +250,7 @@ Use right click to delete sections in the upper panel and Gaussians in the lower
 Use the menu in the lower left corner to fit the functions to the sections and to toggle whether or not to fix the continuum.
 To zoom in the upper panel, position the cursor on top of it and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = Gaussians(spectrum)
-
-    method.set_fix_continuum(fix_continuum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-    except KeyError:
-        pass
-    else:
-        method(**params)
+    method = methods.feature(Gaussians, spectrum, header, fix_continuum)
 
     if gui is None:
         return method
@@ -2,7 +2,6 @@ import numpy as np
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 
 from ..base.intervals import BaseIntervals
 from ..base.interval import BaseInterval
@@ -11,6 +10,7 @@ from ..base.point import BaseLabelTogglePoint
 from ..base.label import BaseFloatLabel
 
 from ....tools.velocity import Minima
+from ....tools import methods
 
 class MinimumPoint (BaseLabelTogglePoint) :
 
@@ -100,14 +100,7 @@ Click on the markers in the lower panel to toggle them for measurement. If known
 Use right click to delete sections in the upper panel.
 To zoom in the upper panel, position the cursor on top of it and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = Minima(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-    except KeyError:
-        pass
-    else:
-        method(**params)
+    method = methods.feature(Minima, spectrum, header)
 
     if gui is None:
         return method
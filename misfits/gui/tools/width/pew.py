@@ -3,7 +3,6 @@ from matplotlib import cm
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 
 from ...plot import WidthPolygon
 
@@ -13,6 +12,7 @@ from ..base.points import BaseConnectingPoints
 from ..base.connection import BaseConnection
 
 from ....tools.width import pEW
+from ....tools import methods
 
 class PseudoEquivalentWidthConnection (BaseConnection) :
 
@@ -139,14 +139,7 @@ To define a pEW, click on a marker and drag the cursor to another marker in the
 Use right click to delete sections in the upper panel and pEWs in the lower panel.
 To zoom in the upper panel, position the cursor on top of it and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = pEW(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-    except KeyError:
-        pass
-    else:
-        method(**params)
+    method = methods.feature(pEW, spectrum, header)
 
     if gui is None:
         return method
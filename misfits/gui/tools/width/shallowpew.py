@@ -3,7 +3,6 @@ from matplotlib import cm
 
 from inspect import currentframe, getframeinfo
 
-from .... import get_parameters_from_header
 
 from ...plot import WidthPolygon
 
@@ -12,6 +11,7 @@ from ..base.interval import BaseInterval
 from ..base.base import Base
 
 from ....tools.width import ShallowpEW
+from ....tools import methods
 
 class BasePolynomialFit (Base) :
 
@@ -438,14 +438,7 @@ To define a pEW, click and drag to define an area to fit a continuum on one side
 Use right click to delete sections in the upper panel and pEWs in the lower panel.
 To zoom in the upper panel, position the cursor on top of it and use the scrolling to zoom in and out and the middle button to center.'''
 
-    method = ShallowpEW(spectrum)
-
-    try:
-        params = get_parameters_from_header(method, header)
-    except KeyError:
-        pass
-    else:
-        method(**params)
+    method = methods.feature(ShallowpEW, spectrum, header)
 
     if gui is None:
         return method
@@ -0,0 +1,144 @@
+from copy import deepcopy
+
+from .errors import MethodError
+from .paramfuncs import get_parameters_from_header
+from .tools import methods
+
+class Pipeline (object) :
+
+    def __init__(self, smooth=None, error=None, feature=None, uncertainty=None, params=None, fix_continuum=False, cache=None, **options):
+
+        # names as on the command line, e.g. lowpass, rawsmooth, velocity.gaussians and montecarlo
+        self.smooth = 'smooth.' + smooth if smooth else None
+        self.error = 'error.' + error if error else None
+        self.feature = feature if feature else None
+        self.uncertainty = 'uncertainty.' + uncertainty if uncertainty else None
+
+        for name in (self.smooth, self.error, self.feature, self.uncertainty):
+            if not name is None and not name in methods.METHODS:
+                raise MethodError('unknown method %s' % name)
+
+        self.params = deepcopy(params) if not params is None else {}
+        self.fix_continuum = fix_continuum
+
+        # N, workers, seed, tolerance and streaming of the uncertainty estimate
+        self.options = options
+
+        # results of every stage are reused while their inputs are unchanged
+        self.cache = cache
+
+        self.tools = {}
+
+    def get_tool(self, name, spectrum):
+
+        # tools are created once and moved on to every new spectrum
+        if not name in self.tools:
+            self.tools[name] = methods.get_tool(name)(spectrum)
+        else:
+            self.tools[name].set_spectrum(spectrum)
+
+        return self.tools[name]
+
+    def get_parameters(self, method, params):
+
+        # None when the parameters are missing, the method then chooses its own
+        try:
+            return get_parameters_from_header(method, params)
+        except KeyError:
+            return None
+
+    def stage(self, name, spectrum, params, key, call, *options):
+
+        p = self.get_parameters(methods.get_tool(name), params)
+
+        # the key of a stage covers the spectrum and every stage before it
+        key = self.cache.key(key, name, p, *options) if not self.cache is None else None
+        value = self.cache.get(key) if not key is None else None
+
+        if value is None:
+            method = self.get_tool(name, spectrum)
+            value = call(method, p), method.get_parameters()
+            if not key is None:
+                self.cache.put(key, value)
+        else:
+            method = None
+
+        # stored as update_parameter_header does
+        for k, v in (value[1] or {}).items():
+            params['%s.%s' % (name, k)] = v
+
+        return method, value[0], key
+
+    def restore(self, name, spectrum, params):
+
+        # a method skipped by the cache with the parameters it had
+        method = self.get_tool(name, spectrum)
+        method.set_parameters(**self.get_parameters(method, params))
+
+        if hasattr(method, 'set_fix_continuum'):
+            method.set_fix_continuum(self.fix_continuum)
+
+        return method
+
+    def run(self, spectrum, header=None):
+
+        # parameters of the spectrum override those of the pipeline
+        params = deepcopy(self.params)
+        params.update(deepcopy(header) if not header is None else {})
+
+        smooth, feature, value = None, None, None
+
+        key = None
+        if not self.cache is None:
+            key = self.cache.key(spectrum._wave, spectrum.flux, spectrum._error, spectrum._smooth, spectrum.z, spectrum.continuum_error)
+
+        if not self.smooth is None:
+            call = lambda method, p: method(**(method.set_parameters(**p) if not p is None else method.auto()))
+            smooth, data, key = self.stage(self.smooth, spectrum, params, key, call)
+            spectrum.set_smooth(data)
+
+        if not self.error is None:
+            call = lambda method, p: method(**(method.set_parameters(**p) if not p is None else method.auto()))
+            _, data, key = self.stage(self.error, spectrum, params, key, call)
+            spectrum.set_error(data)
+
+        if not self.feature is None:
+
+            def call(method, p):
+                if hasattr(method, 'set_fix_continuum'):
+                    method.set_fix_continuum(self.fix_continuum)
+                return method(**p) if not p is None else None
+
+            feature, _, key = self.stage(self.feature, spectrum, params, key, call, self.fix_continuum)
+
+        if not self.uncertainty is None:
+
+            # montecarlo is only repeatable with a seed
+            if not self.cache is None and (self.uncertainty == 'uncertainty.propagation' or not self.options.get('seed') is None):
+                key = self.cache.key(key, self.uncertainty, sorted(self.options.items()))
+                value = self.cache.get(key)
+            else:
+                key = None
+
+            if value is None:
+
+                if feature is None and not self.feature is None:
+                    feature = self.restore(self.feature, spectrum, params)
+                if smooth is None and not self.smooth is None and 'method.smooth' in getattr(feature, 'DEPENDENCIES', ()):
+                    smooth = self.restore(self.smooth, spectrum, params)
+
+                _, run, _ = methods.METHODS[self.uncertainty]
+                uncertainty = run(methods.get_tool(self.uncertainty), spectrum, feature, smooth=smooth, **self.options)
+
+                # montecarlo samples of every feature, unless they were streamed
+                samples = getattr(uncertainty, 'samples', None) or None
+                value = dict(results=uncertainty.results(), samples=samples)
+
+                if not key is None:
+                    self.cache.put(key, value)
+
+        return dict(
+            parameters = params,
+            results = value['results'] if not value is None else None,
+            samples = value['samples'] if not value is None else None,
+        )
@@ -0,0 +1,110 @@
+import numpy as np
+
+from .spectrum import Spectrum
+from .batch import SpectrumBatch
+from .errors import WavelengthError
+
+def get_edges(wave):
+
+    wave = np.asarray(wave, dtype=float)
+
+    if wave.shape[-1] < 2:
+        raise WavelengthError('can\'t resample a single pixel')
+
+    # pixels reach halfway to their neighbours, the outer ones as far out as in
+    middle = (wave[...,1:] + wave[...,:-1]) / 2
+    first, last = 2*wave[...,:1] - middle[...,:1], 2*wave[...,-1:] - middle[...,-1:]
+
+    return np.concatenate([first, middle, last], axis=-1)
+
+def rebin(wave, target, flux, error=None):
+
+    # wave and flux of one or more spectra, (N,) or (M, N), onto the target grid (K,)
+    edges, _edges = get_edges(wave), get_edges(target)
+
+    if np.any(_edges[0] < edges[...,0]) or np.any(_edges[-1] > edges[...,-1]):
+        raise WavelengthError('wavelength grid reaches outside the spectrum')
+
+    flux = np.asarray(flux, dtype=float)
+    width, _width = np.diff(edges, axis=-1), np.diff(_edges)
+
+    # pixel of every target edge, with one search per wavelength grid
+    if edges.ndim == 1:
+        i = np.searchsorted(edges, _edges, 'right') - 1
+    else:
+        i = np.array([np.searchsorted(e, _edges, 'right') - 1 for e in edges])
+    i = np.clip(i, 0, flux.shape[-1]-1)
+
+    # values of a at the indices i, along the last axis of every spectrum
+    def take(a, i):
+        if i.ndim == 1:
+            return a[...,i]
+        return np.take_along_axis(np.broadcast_to(a, i.shape[:-1] + a.shape[-1:]), i, -1)
+
+    # integrated flux up to every target edge, from the cumulative sum over whole pixels
+    offset = _edges - take(edges, i)
+    cumulative = np.concatenate([np.zeros(flux.shape[:-1] + (1,)), np.cumsum(flux * width, axis=-1)], axis=-1)
+    integral = take(cumulative, i) + take(flux, i) * offset
+
+    _flux = np.diff(integral, axis=-1) / _width
+
+    if error is None:
+        return _flux, None
+
+    error = np.asarray(error, dtype=float)
+
+    # variances of the partly covered pixels at both ends and of the whole pixels in between
+    e0, e1 = take(error, i[...,:-1]), take(error, i[...,1:])
+    first = e0 * (take(edges, i[...,:-1]+1) - _edges[:-1])
+    last = e1 * offset[...,1:]
+
+    cumulative = np.concatenate([np.zeros(error.shape[:-1] + (1,)), np.cumsum((error * width)**2, axis=-1)], axis=-1)
+    between = take(cumulative, i[...,1:]) - take(cumulative, i[...,:-1]+1)
+
+    variance = np.where(i[...,:-1] == i[...,1:], (e0 * _width)**2, first**2 + between + last**2)
+
+    return _flux, np.sqrt(np.maximum(variance, 0)) / _width
+
+def resample(spectrum, wave):
+
+    # the observed wavelengths are resampled, redshift and continuum error are kept
+    wave = np.asarray(wave, dtype=float)
+
+    flux, error = rebin(spectrum._wave, wave, spectrum.flux, spectrum._error)
+    smooth = rebin(spectrum._wave, wave, spectrum._smooth)[0] if not spectrum._smooth is None else None
+
+    return Spectrum(wave, flux, error, smooth, spectrum.z, spectrum.continuum_error, spectrum.compact)
+
+def resample_batch(spectra, wave, names=None):
+
+    spectra, wave = list(spectra), np.asarray(wave, dtype=float)
+
+    M, K = len(spectra), len(wave)
+    flux, error, smooth = np.empty((M, K)), np.empty((M, K)), np.empty((M, K))
+
+    errors = all(not spectrum._error is None for spectrum in spectra)
+    smooths = all(not spectrum._smooth is None for spectrum in spectra)
+
+    # spectra of the same length are resampled together as one 2d array
+    groups = {}
+    for k, spectrum in enumerate(spectra):
+        groups.setdefault(spectrum.N, []).append(k)
+
+    for k in groups.values():
+
+        _wave = np.array([spectra[j]._wave for j in k])
+        _flux = np.array([spectra[j].flux for j in k])
+        _error = np.array([spectra[j]._error for j in k]) if errors else None
+
+        flux[k], e = rebin(_wave, wave, _flux, _error)
+
+        if errors:
+            error[k] = e
+
+        if smooths:
+            smooth[k] = rebin(_wave, wave, np.array([spectra[j]._smooth for j in k]))[0]
+
+    z = [spectrum.z for spectrum in spectra]
+    continuum_error = spectra[0].continuum_error if M else 0
+
+    return SpectrumBatch(wave, flux, error if errors else None, smooth if smooths else None, z, continuum_error, names)
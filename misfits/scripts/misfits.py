@@ -1,73 +1,140 @@
-import argparse
+import os, sys, json, argparse
 from copy import deepcopy
+from itertools import chain, repeat
+from contextlib import redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
 from warnings import filterwarnings
 
 import numpy as np
 
-from .. import __version__, readfile, update_parameter_header
-from ..gui import Simple, SimpleMultipage
-
-from ..gui.tools import smooth
-from ..gui.tools import error
-from ..gui.tools import velocity
-from ..gui.tools import width
-from ..gui.tools import uncertainty
+from .. import __version__, readfile, update_parameter_header, Cache, SpectrumWriter
+from ..tools import methods
 
 filterwarnings('ignore')
 
-feature = type('',(object,),dict(METHODS={}))
-for method, function in velocity.METHODS.items():
-    feature.METHODS['velocity.' + method] = function
-for method, function in width.METHODS.items():
-    feature.METHODS['width.' + method] = function
+def get_choices(names, prefix=True):
+
+    return {name if prefix else name.split('.',1)[1]: methods.METHODS[name][2] for name in names}
+
+def get_help(choices):
+
+    return ''.join(['\n    %s - %s' % (k, v) for k, v in choices.items()])
 
 def main():
 
+    if sys.argv[1:2] == ['serve']:
+        from .server import serve
+        return serve(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description='Measure Intricate Spectral Features In Transient Spectra',
         formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog,  max_help_position=30),
-        epilog='example:\n  $ misfits lowpass rawsmooth velocity.gaussians montecarlo spectrum.fits -z 0.01'
+        epilog='example:\n  $ misfits lowpass rawsmooth velocity.gaussians montecarlo spectrum.fits -z 0.01' +
+               '\n\nrun as a server, see misfits serve --help:\n  $ misfits serve --socket /tmp/misfits.sock'
     )
   
-    methods = ''.join(['\n    %s - %s' % (k, v.__doc__.split('\n')[2]) for k, v in smooth.METHODS.items()])
-    parser.add_argument('smooth', metavar='smooth', choices=list(smooth.METHODS.keys()) + ['-'], help='smoothing method' + methods)
-    methods = ''.join(['\n    %s - %s' % (k, v.__doc__.split('\n')[2]) for k, v in error.METHODS.items()])
-    parser.add_argument('error', metavar='error', choices=list(error.METHODS.keys()) + ['-'], help='error estimate method' + methods)
-    methods = ''.join(['\n    %s - %s' % (k, v.__doc__.split('\n')[2]) for k, v in feature.METHODS.items()])
-    parser.add_argument('feature', metavar='feature', choices=list(feature.METHODS.keys()) + ['-'], help='feature and measuring method' + methods)
-    methods = ''.join(['\n    %s - %s' % (k, v.__doc__.split('\n')[2]) for k, v in uncertainty.METHODS.items()])
-    parser.add_argument('uncertainty', metavar='uncertainty', choices=list(uncertainty.METHODS.keys()) + ['-'], help='uncertainty estimate method' + methods)
+    choices = get_choices(methods.get_methods('smooth'), False)
+    parser.add_argument('smooth', metavar='smooth', choices=list(choices) + ['-'], help='smoothing method' + get_help(choices))
+    choices = get_choices(methods.get_methods('error'), False)
+    parser.add_argument('error', metavar='error', choices=list(choices) + ['-'], help='error estimate method' + get_help(choices))
+    choices = get_choices(methods.get_methods('velocity') + methods.get_methods('width'))
+    parser.add_argument('feature', metavar='feature', choices=list(choices) + ['-'], help='feature and measuring method' + get_help(choices))
+    choices = get_choices(methods.get_methods('uncertainty'), False)
+    parser.add_argument('uncertainty', metavar='uncertainty', choices=list(choices) + ['-'], help='uncertainty estimate method' + get_help(choices))
 
     options  = '\n    fits - 1D primary HDU with CRVAL1 and CDELT1 or CD1_1'
     options += '\n    ascii - Minimum wavelength and flux columns (optional error and smooth)'
-    parser.add_argument('spectrum', help='spectrum file' + options)
+    parser.add_argument('spectrum', nargs='?', help='spectrum file' + options)
 
     parser.add_argument('-z', metavar='redshift', default=0, type=float, help='object redshift (default: 0)')
     parser.add_argument('-N', metavar='iterations', default=1000, type=int, help='sampling iterations (default: 1000)')
+    parser.add_argument('-j', '--jobs', metavar='workers', default=1, type=int, help='parallel sampling processes (default: 1)')
+    parser.add_argument('--tolerance', metavar='precision', default=None, type=float, help='stop sampling when the statistics change less than\nprecision stddevs, using -N as maximum (default: off)')
+    parser.add_argument('--streaming', action='store_true', default=False, help='keep running statistics instead of all samples')
+    parser.add_argument('--seed', metavar='integer', default=None, type=int, help='seed of the sampling, the same seed gives the same\nsamples with any --jobs or --streaming (default: random)')
     parser.add_argument('--continuum-error', metavar='fraction', default=0, type=float, help='fraction of flux as continuum error (default: 0)')
     parser.add_argument('--fix-continuum', action='store_true', default=False, help='don\'t fit the continuum')
     parser.add_argument('--headless', action='store_true', help='run automatically without gui')
+    parser.add_argument('--batch', metavar='filelist', help='process the spectrum files listed in filelist headless,\nin parallel with --jobs and one result record per file')
     parser.add_argument('--inherit', metavar='filename', help='inherit metadata from spectrum')
     parser.add_argument('--output', metavar='format', default='ascii', choices=('ascii', 'json', 'none'), help='format of output (default: ascii)')
+    parser.add_argument('--cache', metavar='directory', help='keep parsed spectra in directory for faster reading')
+    parser.add_argument('--cache-size', metavar='megabytes', default=1024, type=float, help='maximum size of the cache (default: 1024)')
     parser.add_argument('--save', metavar='filename', help='save spectrum-data to file')
+    parser.add_argument('--save-format', metavar='format', default='ascii', choices=('ascii', 'npy', 'npz', 'fits'), help='format of saved spectrum-data (default: ascii)')
+    parser.add_argument('--samples', metavar='filename', help='save monte carlo samples to npz-file')
     parser.add_argument('--version', action='version', version=__version__,  help='print the current version of misfits')
 
     args = parser.parse_args()
 
-    spectrum, header = readfile(args.spectrum)
+    if args.spectrum is None and args.batch is None:
+        parser.error('the following arguments are required: spectrum')
+
+    if args.batch and args.save and not args.save_format in SpectrumWriter.FORMATS:
+        parser.error('batch mode saves spectra in %s format' % ' or '.join(SpectrumWriter.FORMATS))
+
+    args.output = args.output if args.output != 'none' else None
+
+    cache = get_cache(args)
+
+    inherited = readfile(args.inherit, cache)[1] if not args.inherit is None else {}
+
+    if not args.batch is None:
+        return batch(args, inherited)
+
+    spectrum, header = read(args, args.spectrum, inherited, cache)
+
+    smooth_method, feature_method = measure(args, spectrum, header)
+
+    if not args.uncertainty == '-':
+        params = feature_method, args.output, args.N, smooth_method, args.jobs, args.tolerance, args.streaming, args.seed
+        uncertainty_method, gui = run(args, 'uncertainty.' + args.uncertainty, 'SimpleMultipage', spectrum, *params)
+        if args.output:
+            print(uncertainty_method)
+        if args.samples and hasattr(uncertainty_method, 'save'):
+            uncertainty_method.save(args.samples)
+        if not args.headless:
+            gui.mainloop()
+    else:
+        uncertainty_method = None
+
+    if args.save:
+        if args.save == '-':
+            args.save = None
+        spectrum.save(header, args.save, args.save_format)
+
+def get_cache(args):
+
+    return Cache(args.cache, int(args.cache_size * 2**20)) if args.cache else None
+
+def read(args, filename, inherited, cache):
+
+    spectrum, header = readfile(filename, cache)
     spectrum.set_redshift(args.z)
     spectrum.set_continuum_error(args.continuum_error)
 
-    args.output = args.output if args.output != 'none' else None
+    #header = {**inherited, **header} # python3
+    header, _header = deepcopy(inherited), header #FIXME with python3
+    header.update(_header)
+
+    return spectrum, header
+
+def run(args, name, window, spectrum, *params):
+
+    if args.headless:
+        return methods.run(name, spectrum, *params), None
+
+    # the gui is only imported once a window is opened
+    from .. import gui
 
-    if not args.inherit is None:
-        #header = {**readfile(args.inherit)[1], **header} # python3
-        header, _header = readfile(args.inherit)[1], header #FIXME with python3
-        header.update(_header)
+    window = getattr(gui, window)()
+
+    return methods.get_gui(name)(window, spectrum, *params), window
+
+def measure(args, spectrum, header):
 
     if not args.smooth == '-':
-        gui = Simple() if not args.headless else None
-        smooth_method = smooth.METHODS[args.smooth](gui, spectrum, header)
+        smooth_method, gui = run(args, 'smooth.' + args.smooth, 'Simple', spectrum, header)
         if not args.headless:
             gui.mainloop()
         update_parameter_header(smooth_method, header)
@@ -75,8 +142,7 @@ def main():
         smooth_method = None
 
     if not args.error == '-':
-        gui = Simple() if not args.headless else None
-        error_method = error.METHODS[args.error](gui, spectrum, header)
+        error_method, gui = run(args, 'error.' + args.error, 'Simple', spectrum, header)
         if not args.headless:
             gui.mainloop()
         update_parameter_header(error_method, header)
@@ -84,27 +150,98 @@ def main():
         error_method = None
 
     if not args.feature == '-':
-        gui = Simple() if not args.headless else None
         params = args.fix_continuum,
-        feature_method = feature.METHODS[args.feature](gui, spectrum, header, *params)
+        feature_method, gui = run(args, args.feature, 'Simple', spectrum, header, *params)
         if not args.headless:
             gui.mainloop()
         update_parameter_header(feature_method, header)
     else:
         feature_method = None
 
-    if not args.uncertainty == '-':
-        gui = SimpleMultipage() if not args.headless else None
-        params = feature_method, args.output, args.N, smooth_method
-        uncertainty_method = uncertainty.METHODS[args.uncertainty](gui, spectrum, *params)
-        if args.output:
-            print(uncertainty_method)
-        if not args.headless:
-            gui.mainloop()
-    else:
-        uncertainty_method = None
+    return smooth_method, feature_method
 
-    if args.save:
-        if args.save == '-':
-            args.save = None
-        spectrum.save(str(header), args.save)
+def process(filename, args, inherited):
+
+    try:
+
+        spectrum, header = read(args, filename, inherited, get_cache(args))
+
+        smooth_method, feature_method = measure(args, spectrum, header)
+
+        if not args.uncertainty == '-':
+            # files are already processed in parallel, sampling runs serially and quietly
+            params = feature_method, args.output, args.N, smooth_method, 1, args.tolerance, args.streaming, args.seed
+            with open(os.devnull, 'w') as devnull, redirect_stderr(devnull):
+                uncertainty_method = methods.run('uncertainty.' + args.uncertainty, spectrum, *params)
+        else:
+            uncertainty_method = None
+
+    except Exception as e:
+
+        return get_record(args, filename, error=e), None, inherited
+
+    return get_record(args, filename, uncertainty_method), spectrum if args.save else None, header
+
+def get_record(args, filename, method=None, error=None):
+
+    if args.output == 'json':
+
+        output = dict(file=filename)
+        if not error is None:
+            output.update(error=str(error))
+        elif not method is None:
+            output.update(method.results())
+
+        return json.dumps(output)
+
+    elif args.output == 'ascii':
+
+        output = ['# %s' % filename]
+        if not error is None:
+            output.append('# error: %s' % error)
+        elif not method is None:
+            output.append(str(method))
+
+        return '\n'.join(output)
+
+def batch(args, inherited):
+
+    with open(args.batch) as fd:
+        filenames = [line.strip() for line in fd if line.strip() and line.strip()[0] != '#']
+
+    args.headless = True
+
+    n, first = len(filenames), []
+
+    # without --inherit the parameters of the first spectrum are used for the rest
+    if not inherited and filenames:
+        first.append(process(filenames[0], args, inherited))
+        filenames, inherited = filenames[1:], first[0][2]
+
+    writer = SpectrumWriter(args.save if args.save != '-' else None, args.save_format) if args.save else None
+    executor = ProcessPoolExecutor(args.jobs) if args.jobs > 1 else None
+
+    try:
+
+        params = filenames, repeat(args), repeat(inherited)
+        results = chain(first, executor.map(process, *params) if executor else map(process, *params))
+
+        for i, (record, spectrum, header) in enumerate(results):
+
+            if not record is None:
+                print(record, flush=True)
+
+            if not writer is None and not spectrum is None:
+                writer.write(spectrum, header)
+
+            print('Batch: %d/%d' % (i+1, n), file=sys.stderr, end='\r')
+
+        print(''.ljust(80), file=sys.stderr, end='\r')
+
+    finally:
+
+        if not executor is None:
+            executor.shutdown()
+
+        if not writer is None:
+            writer.close()
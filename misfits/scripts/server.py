@@ -0,0 +1,143 @@
+import os, sys, json, argparse, threading, socketserver
+from queue import Queue
+from concurrent.futures import ProcessPoolExecutor
+
+from .. import readfile, Spectrum, Pipeline, StageCache
+from ..tools import methods
+
+# request fields passed on to the pipeline and the uncertainty estimate
+METHODS = 'smooth', 'error', 'feature', 'uncertainty'
+OPTIONS = 'N', 'tolerance', 'streaming', 'seed'
+
+CACHE = None
+
+def warm(directory=None):
+
+    global CACHE
+
+    # workers keep the tools imported, and sampling progress is not shown
+    for name in methods.METHODS:
+        methods.get_tool(name)
+
+    # repeated requests reuse the stages they share
+    CACHE = StageCache(directory=directory)
+
+    sys.stderr = open(os.devnull, 'w')
+
+def job(line):
+
+    request = {}
+
+    try:
+
+        request = json.loads(line)
+
+        if isinstance(request['spectrum'], dict):
+            spectrum, header = Spectrum(**request['spectrum']), {}
+        else:
+            spectrum, header = readfile(request['spectrum'])
+
+        # parameters of the request override those of the file
+        header.update(request.get('parameters', {}))
+
+        spectrum.set_redshift(request.get('z', 0))
+        spectrum.set_continuum_error(request.get('continuum_error', 0))
+
+        names = [request.get(k) if request.get(k) != '-' else None for k in METHODS]
+        options = {k: request[k] for k in OPTIONS if k in request}
+
+        pipeline = Pipeline(*names, params=header, fix_continuum=request.get('fix_continuum', False), cache=CACHE, **options)
+        output = pipeline.run(spectrum)['results'] or {}
+
+    except Exception as e:
+
+        output = dict(error='%s: %s' % (type(e).__name__, e))
+
+    if isinstance(request, dict) and 'id' in request:
+        output['id'] = request['id']
+
+    return json.dumps(output)
+
+class Server (object) :
+
+    def __init__(self, jobs=1, queue=64, cache=None):
+
+        self.executor = ProcessPoolExecutor(jobs, initializer=warm, initargs=(cache,))
+
+        # requests are only read while the queue has room
+        self.slots = threading.BoundedSemaphore(queue)
+
+    def submit(self, line):
+
+        self.slots.acquire()
+
+        future = self.executor.submit(job, line)
+        future.add_done_callback(lambda f: self.slots.release())
+
+        return future
+
+    def handle(self, rfile, wfile):
+
+        pending = Queue()
+
+        # results are written in the order of the requests
+        def write():
+            for future in iter(pending.get, None):
+                wfile.write((future.result() + '\n').encode())
+                wfile.flush()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+
+        try:
+            for line in rfile:
+                if line.strip():
+                    pending.put(self.submit(line))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def serve(self, socket=None):
+
+        try:
+
+            if socket is None:
+                return self.handle(sys.stdin.buffer, sys.stdout.buffer)
+
+            server = self
+
+            class Handler (socketserver.StreamRequestHandler) :
+
+                def handle(self):
+                    server.handle(self.rfile, self.wfile)
+
+            with socketserver.ThreadingUnixStreamServer(socket, Handler) as unix:
+                try:
+                    unix.serve_forever()
+                finally:
+                    os.remove(socket)
+
+        finally:
+
+            self.executor.shutdown()
+
+def serve(argv):
+
+    parser = argparse.ArgumentParser(
+        prog='misfits serve',
+        description='Measure spectra from newline-delimited json requests with warm workers',
+        formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog,  max_help_position=30),
+        epilog='example request:\n  {"id": 1, "spectrum": "spectrum.fits", "smooth": "lowpass", "error": "rawsmooth",\n   "feature": "velocity.gaussians", "uncertainty": "montecarlo", "parameters": {...}}'
+    )
+
+    parser.add_argument('--socket', metavar='path', help='listen on a unix socket instead of stdin and stdout')
+    parser.add_argument('-j', '--jobs', metavar='workers', default=1, type=int, help='requests measured in parallel (default: 1)')
+    parser.add_argument('--cache', metavar='directory', help='keep results of every stage on disk, shared by the workers')
+    parser.add_argument('--queue', metavar='requests', default=64, type=int, help='maximum requests waiting or running (default: 64)')
+
+    args = parser.parse_args(argv)
+
+    try:
+        Server(args.jobs, args.queue, args.cache).serve(args.socket)
+    except KeyboardInterrupt:
+        pass
@@ -1,17 +1,39 @@
-import sys
+import sys, weakref
+from copy import deepcopy
+from itertools import count
 
 import numpy as np
 
-from scipy.interpolate import UnivariateSpline
-
-from .spline import Spline
 from .errors import SpectrumError
 
+class Subspectrum (object) :
+
+    __slots__ = 'wave', 'flux', 'error', 'smooth', 'z', 'continuum_error'
+
+    def __init__(self, wave, flux, error, smooth, z, continuum_error):
+
+        self.wave, self.flux, self.error, self.smooth = wave, flux, error, smooth
+        self.z, self.continuum_error = z, continuum_error
+
+# versions are unique over all spectra and arrays
+VERSION = count(1)
+
+# attribute of each versioned array
+ARRAYS = dict(flux='flux', error='_error', smooth='_smooth')
+
 class Spectrum (object) :
 
-    def __init__(self, wave, flux, error=None, smooth=None, z=0, continuum_error=0):
+    # compact spectra keep flux, error and smooth in single precision
+    COMPACT = np.float32
+
+    def __init__(self, wave, flux, error=None, smooth=None, z=0, continuum_error=0, compact=False):
+
+        self._wave = np.asarray(wave)
+        self.compact, self._shared = compact, None
 
-        self._wave = np.array(wave)
+        self.versions = dict(wave=next(VERSION), flux=0, error=0, smooth=0)
+        self.flux, self._error, self._smooth, self.z = None, None, None, None
+        self._memo = {}
 
         if len(self._wave.shape) > 1:
             raise SpectrumError('wavelengh is not 1d')
@@ -21,26 +43,82 @@ class Spectrum (object) :
         self.set_continuum_error(continuum_error)
 
         self.N = len(self._wave)
+        self._sorted = bool(np.all(self._wave[1:] >= self._wave[:-1]))
 
         self.set_error(error)
         self.set_smooth(smooth)
 
-    def set_flux(self, flux):
+    def set_flux(self, flux, validate=True):
+
+        if validate:
+
+            flux = np.asarray(flux)
+
+            if not np.isfinite(flux).all():
+                raise SpectrumError('spectrum include non-finite number')
+            elif self._wave.shape != flux.shape:
+                raise SpectrumError('wavelengh and flux dimensions doesn\'t match')
+
+            if self.compact:
+                flux = flux.astype(self.COMPACT, copy=False)
+
+        self.flux, self._smooth = flux, None
+        self.update('flux', 'smooth')
+
+    def update(self, *names):
+
+        # every set is a new version, arrays may have been changed in place
+        for name in names:
+            self.versions[name] = next(VERSION)
+
+    def memoized(self, name, build, *versions):
+
+        # products are rebuilt only when an array they are built from is set
+        key = tuple(self.versions[v] for v in versions)
+
+        if not name in self._memo or self._memo[name][0] != key:
+            self._memo[name] = key, build()
+
+        return self._memo[name][1]
+
+    def checkpoint(self, *names):
 
-        flux = np.array(flux)
+        # arrays with their versions and the products built so far, for a perturbation to restore
+        arrays = {name: (getattr(self, ARRAYS[name]), self.versions[name]) for name in names}
 
-        if (~np.isfinite(flux)).any():
-            raise SpectrumError('spectrum include non-finite number')
-        elif self._wave.shape != flux.shape:
-            raise SpectrumError('wavelengh and flux dimensions doesn\'t match')
+        return arrays, dict(self._memo)
 
-        self.flux = flux
-        self._smooth, self._spline, self._continuum = None, None, None
+    def restore(self, checkpoint):
+
+        # the arrays are set back unchanged, so products built from them before are still valid
+        arrays, memo = checkpoint
+
+        for name, (value, version) in arrays.items():
+            setattr(self, ARRAYS[name], value)
+            self.versions[name] = version
+
+        self._memo.update(memo)
 
     def set_redshift(self, z):
 
-        self.z = z
-        self.wave = self._wave.copy() / (1+z)
+        if z != self.z:
+            self.z, self._rest = z, None
+            self.update('wave')
+
+    @property
+    def wave(self):
+
+        if not self.z:
+            return self._wave
+
+        # compact spectra don't keep a rest-frame copy of the wavelengths
+        if self._rest is None:
+            rest = self._wave / (1+self.z)
+            if self.compact:
+                return rest
+            self._rest = rest
+
+        return self._rest
 
     def set_continuum_error(self, continuum_error):
 
@@ -49,18 +127,14 @@ class Spectrum (object) :
     @property
     def spline(self):
 
-        if self._spline is None:
-            self._spline = Spline(self)
+        from .spline import Spline # imports scipy
 
-        return self._spline
+        return self.memoized('spline', lambda: Spline(self), 'wave', 'smooth')
 
     @property
     def continuum(self):
 
-        if self._continuum is None:
-            self._continuum = np.poly1d(np.polyfit(self.wave, self.flux, 2))
-
-        return self._continuum
+        return self.memoized('continuum', lambda: np.poly1d(np.polyfit(self.wave, self.flux, 2)), 'wave', 'flux')
 
     @property
     def error(self):
@@ -72,15 +146,19 @@ class Spectrum (object) :
 
     def set_error(self, error):
 
-        error = np.array(error)
+        error = np.asarray(error)
 
         if error is None or not error.any() or np.isnan(error).all():
-            self._error = None
-        elif (~np.isfinite(error)).any():
+            error = None
+        elif not np.isfinite(error).all():
             raise SpectrumError('error spectrum include non-finite value')
         elif error.shape != self._wave.shape:
             raise SpectrumError('error spectrum doesn\'t fit spectrum')
-        else: self._error = error
+        elif self.compact:
+            error = error.astype(self.COMPACT, copy=False)
+
+        self.update('error')
+        self._error = error
 
     @property
     def smooth(self):
@@ -92,66 +170,206 @@ class Spectrum (object) :
 
     def set_smooth(self, smooth):
 
-        smooth = np.array(smooth)
+        smooth = np.asarray(smooth)
 
         if smooth is None or not smooth.any() or np.isnan(smooth).all():
-            self._smooth = None
+            smooth = None
         elif smooth.shape != self._wave.shape:
             raise SpectrumError('smoothed spectrum doesn\'t fit spectrum')
-        else:
-            self._smooth = smooth
+        elif self.compact:
+            smooth = smooth.astype(self.COMPACT, copy=False)
 
-        self._spline = None
+        self.update('smooth')
+        self._smooth = smooth
 
     def sample(self):
 
         return self.flux + self.error * np.random.random(self.N)
 
-    def __call__(self, start=None, stop=None):
+    def sample_batch(self, n, out=None, random=np.random):
+
+        if out is None:
+            out = np.empty((n, self.N))
+        elif out.shape != (n, self.N):
+            raise SpectrumError('sample block doesn\'t fit spectrum')
+
+        # same random stream as n consecutive calls to sample, or to a generator that is given
+        np.multiply(random.random((n, self.N)), self.error, out=out)
+        out += self.flux
+
+        return out
+
+    def grid(self):
 
-        start = start if not start is None else self.wave[ 0]
-        stop  = stop  if not stop  is None else self.wave[-1]
+        # compact spectra search the observed wavelengths with the bounds redshifted instead
+        return (self._wave, 1+self.z) if self.compact else (self.wave, 1)
 
-        i = np.where( (start <= self.wave) & (self.wave <= stop) )
+    def rest(self, i):
+
+        # rest-frame wavelengths of the pixels i, only those are divided in compact spectra
+        return self._wave[i] / (1+self.z) if self.compact and self.z else self.wave[i]
+
+    def __call__(self, start=None, stop=None):
+
+        if self._sorted:
+            # contiguous views of the pixels with start <= wave <= stop
+            wave, scale = self.grid()
+            i = slice(
+                np.searchsorted(wave, start*scale, 'left') if not start is None else 0,
+                np.searchsorted(wave, stop*scale, 'right') if not stop is None else self.N
+            )
+        else:
+            start = start if not start is None else self.wave[ 0]
+            stop  = stop  if not stop  is None else self.wave[-1]
+            i = np.where( (start <= self.wave) & (self.wave <= stop) )
 
         error  =  self._error[i] if not self._error  is None else None
         smooth = self._smooth[i] if not self._smooth is None else None
 
-        return type('subspectrum', (object,), dict(
-            wave = self.wave[i], flux = self.flux[i],
-            error = error, smooth = smooth, z = self.z,
-            continuum_error = self.continuum_error
-        ))
+        return Subspectrum(self.rest(i), self.flux[i], error, smooth, self.z, self.continuum_error)
+
+    def share(self):
+
+        from multiprocessing.shared_memory import SharedMemory
+
+        if not self._shared is None:
+            return self
+
+        arrays = {k: getattr(self, k) for k in ('_wave', 'flux', '_error', '_smooth') if not getattr(self, k) is None}
+        shared = SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays.values())))
+
+        # the arrays become views of one block, pickled spectra attach to it
+        offset, self._layout = 0, []
+        for k, a in arrays.items():
+            view = np.ndarray(a.shape, a.dtype, shared.buf, offset)
+            view[...] = a
+            setattr(self, k, view)
+            self._layout.append((k, a.shape, a.dtype.str, offset))
+            offset += a.nbytes
+
+        self._shared, self._owner = shared, True
+
+        # the block is released when the spectrum is collected without unshare
+        self._unlink = weakref.finalize(self, shared.unlink)
+
+        return self
+
+    def unshare(self):
+
+        if self._shared is None:
+            return self
+
+        for k, _, _, _ in self._layout:
+            setattr(self, k, np.array(getattr(self, k)))
+
+        self._shared.close()
+        if self._owner:
+            self._unlink()
+        self._shared = None
+
+        return self
+
+    def __getstate__(self):
+
+        # versions and products are only known to this process
+        state = self.__dict__.copy()
+        state.update(_memo={})
+        state.pop('_unlink', None)
+
+        if not self._shared is None:
+            for k, _, _, _ in self._layout:
+                del state[k]
+            state.update(_shared=self._shared.name, _owner=False, _rest=None)
+
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.versions = {k: next(VERSION) if v else 0 for k, v in self.versions.items()}
+
+        if isinstance(self._shared, str):
+
+            from multiprocessing.shared_memory import SharedMemory
+
+            self._shared = SharedMemory(self._shared)
+            for k, shape, dtype, offset in self._layout:
+                setattr(self, k, np.ndarray(shape, dtype, self._shared.buf, offset))
+
+    def __deepcopy__(self, memo):
+
+        # copies are private, also of a shared spectrum
+        spectrum = object.__new__(type(self))
+        memo[id(self)] = spectrum
+
+        state = self.__dict__.copy()
+        state.update(_shared=None)
+        state.pop('_unlink', None)
+        spectrum.__dict__.update(deepcopy(state, memo))
+
+        return spectrum
+
+    def nearest(self, wave):
+
+        wave = np.asarray(wave, dtype=float)
+
+        if not self._sorted or self.N < 2:
+            return np.argmin((self.wave - wave[...,None])**2, axis=-1)
+
+        grid, scale = self.grid()
+        wave = wave * scale
+
+        # the closer neighbour on the grid, the lower one on ties as with argmin
+        i = np.clip(np.searchsorted(grid, wave), 1, self.N-1)
+        i -= wave - grid[i-1] <= grid[i] - wave
+
+        return i
 
     def __getitem__(self, i):
 
         try:
-            return self.wave[i], self.flux[i]
+            return self.rest(i), self.flux[i]
         except IndexError as e:
-            pass
+            error = e
 
+        # wavelengths, a scalar or an array, are looked up on the grid
         try:
-            i = np.argmin((self.wave - i)**2)
-        except ValueError:
-            raise e
-        else:
-            return self.wave[i], self.flux[i]
+            i = self.nearest(i)
+        except (ValueError, TypeError):
+            raise error
+
+        return self.rest(i), self.flux[i]
+
+    def save(self, header, filename=None, format='ascii'):
 
-    def save(self, header, filename=None):
+        from .writer import SpectrumWriter, get_columns
+
+        if format == 'npy':
+            np.save(filename if not filename is None else sys.stdout.buffer, get_columns(self))
+            return
+        elif format != 'ascii':
+            with SpectrumWriter(filename, format) as writer:
+                writer.write(self, header)
+            return
 
         if filename is None:
             filename = sys.stdout
 
-        output = [self.wave, self.flux]
+        output = np.full((self.N, 4), np.nan)
+        output[:,0], output[:,1] = self.wave, self.flux
 
-        try:
-            output.append(self.error)
-        except SpectrumError:
-            output.append(np.nan*np.ones(self.N))
+        if not self._error is None:
+            output[:,2] = self._error
 
-        try:
-            output.append(self.smooth)
-        except SpectrumError:
-            output.append(np.nan*np.ones(self.N))
+        if not self._smooth is None:
+            output[:,3] = self._smooth
 
-        np.savetxt(filename, np.transpose(output), header=header)
+        # formatted in one go instead of row by row as np.savetxt
+        lines = ('%.18e %.18e %.18e %.18e\n' * self.N) % tuple(output.ravel())
+        lines = '# %s\n%s' % (header, lines)
+
+        if hasattr(filename, 'write'):
+            filename.write(lines)
+        else:
+            with open(filename, 'w') as fd:
+                fd.write(lines)
@@ -1,14 +1,11 @@
-from inspect import stack, getmro
-
 from copy import deepcopy
 
-from .iterator import BaseIterator
-
 class BaseTool (object) :
 
     def __init__(self, spectrum):
 
         self.set_spectrum(spectrum)
+        self.set_perturbation(False)
 
     def auto(self, limits=None):
 
@@ -18,6 +15,11 @@ class BaseTool (object) :
 
         self.spectrum = spectrum
 
+    def set_perturbation(self, state):
+
+        # set by iterators to apply the modifiers of the tool
+        self.perturbation = state
+
     def set_parameters(self, **params):
 
         params = deepcopy(params)
@@ -50,21 +52,16 @@ class BaseTool (object) :
         def _(f):
             def __(self, *a, **kw):
 
-                if not 'self' in stack()[1][0].f_locals:
-                    return f(self, *a, **kw)
-                caller = stack()[1][0].f_locals['self'].__class__
-                if not BaseIterator in getmro(caller):
+                if not self.perturbation:
                     return f(self, *a, **kw)
 
                 modifier = m(self, *a, **kw)
-                result = f(*next(modifier))
 
+                # closing the modifier undoes its changes, also when f raises
                 try:
-                    next(modifier)
-                except StopIteration:
-                    pass
-
-                return result
+                    return f(*next(modifier))
+                finally:
+                    modifier.close()
 
             return __
         return _
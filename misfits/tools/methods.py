@@ -0,0 +1,87 @@
+from importlib import import_module
+
+from ..paramfuncs import get_parameters_from_header
+
+def smooth(tool, spectrum, header):
+
+    method = tool(spectrum)
+
+    try:
+        params = get_parameters_from_header(method, header)
+        params = method.set_parameters(**params)
+    except KeyError:
+        params = method.auto()
+    spectrum.set_smooth(method(**params))
+
+    return method
+
+def error(tool, spectrum, header):
+
+    method = tool(spectrum)
+
+    try:
+        params = get_parameters_from_header(method, header)
+        params = method.set_parameters(**params)
+    except KeyError:
+        params = method.auto()
+    spectrum.set_error(method(**params))
+
+    return method
+
+def feature(tool, spectrum, header, fix_continuum=False):
+
+    method = tool(spectrum)
+
+    if hasattr(method, 'set_fix_continuum'):
+        method.set_fix_continuum(fix_continuum)
+
+    try:
+        params = get_parameters_from_header(method, header)
+    except KeyError:
+        pass
+    else:
+        method(**params)
+
+    return method
+
+def montecarlo(tool, spectrum, feature, output=None, N=1000, smooth=None, workers=1, tolerance=None, streaming=False, seed=None):
+
+    return tool(spectrum, feature, output, N, smooth, workers, seed, tolerance, streaming)
+
+def propagation(tool, spectrum, feature, output=None, *args, **kwargs):
+
+    return tool(spectrum, feature, output)
+
+# tool, headless run and description of each method, nothing is imported until used
+# the descriptions repeat the one after the title of each gui docstring
+METHODS = {
+    'smooth.lowpass' : ('LowPass', smooth, 'Smoothing using a low-pass filter as described in Marion et al. (2009).'),
+    'smooth.boxcar' : ('Boxcar', smooth, 'Smoothing by convolving the spectrum with a boxcar window with a user-specified width.'),
+    'smooth.smoothingspline' : ('SmoothingSpline', smooth, 'Smoothing using the error spectrum to create a smoothing spline fit to spectrum.'),
+    'smooth.gaussian' : ('Gaussian', smooth, 'Smoothing by convolving the spectrum with a Gaussian window with a user-specified FWHM.'),
+    'error.rawsmooth' : ('RawSmooth', error, 'Estimate the error spectrum by smoothing the |raw-smooth| residuals.'),
+    'velocity.minima' : ('Minima', feature, 'Measure velocities by identifying minima in the smoothed spectrum.'),
+    'velocity.gaussians' : ('Gaussians', feature, 'Measure velocities by fitting Gaussians to sections of the spectrum.'),
+    'width.shallowpew' : ('ShallowpEW', feature, 'Define pEWs by fitting the continuum on each side of the feature.'),
+    'width.pew' : ('pEW', feature, 'Measure pEW by connecting maxima in the smoothed spectrum.'),
+    'uncertainty.propagation' : ('Propagation', propagation, 'Get errors from propagation of uncertainty.'),
+    'uncertainty.montecarlo' : ('MonteCarlo', montecarlo, 'Remeasure features in N realizations of the spectrum.'),
+}
+
+def get_methods(category):
+
+    return [name for name in METHODS if name.split('.')[0] == category]
+
+def get_tool(name):
+
+    category = name.split('.')[0]
+
+    return getattr(import_module('.' + category, __package__), METHODS[name][0])
+
+def get_gui(name):
+
+    return import_module('..gui.tools.' + name, __package__).main
+
+def run(name, spectrum, *args, **kwargs):
+
+    return METHODS[name][1](get_tool(name), spectrum, *args, **kwargs)
@@ -0,0 +1,97 @@
+import numpy as np
+
+class Accumulator (object) :
+
+    CAPACITY = 1000
+
+    def __init__(self, capacity=None):
+
+        self.capacity = capacity if not capacity is None else self.CAPACITY
+
+        self.n, self._mean, self._m2 = 0, 0., 0.
+        self._min, self._max = np.inf, -np.inf
+
+        # quantile sketch of weighted centroids
+        self._values, self._weights, self._buffer = np.array([]), np.array([]), []
+
+    def __len__(self):
+
+        return self.n
+
+    def update(self, values):
+
+        values = np.array(values, dtype=float)
+        values = values[np.isfinite(values)]
+
+        if not len(values):
+            return
+
+        n, mean = len(values), np.mean(values)
+        delta = mean - self._mean
+
+        # pairwise update of the running moments (Chan et al.)
+        self._m2 += np.sum((values - mean)**2) + delta**2 * self.n * n / (self.n + n)
+        self._mean += delta * n / (self.n + n)
+        self.n += n
+
+        self._min, self._max = min(self._min, np.min(values)), max(self._max, np.max(values))
+
+        self._buffer += list(values)
+        if len(self._values) + len(self._buffer) > self.capacity:
+            self.compress()
+
+    def compress(self):
+
+        values = np.r_[self._values, self._buffer]
+        weights = np.r_[self._weights, np.ones(len(self._buffer))]
+
+        i = np.argsort(values, kind='mergesort')
+        values, weights = values[i], weights[i]
+
+        if len(values) > self.capacity:
+
+            # merge neighbours, keeping the tails finer than the center
+            q = (np.cumsum(weights) - weights/2) / np.sum(weights)
+            k = np.floor((np.arcsin(2*q-1)/np.pi + .5) * self.capacity/2)
+            k = np.unique(k, return_inverse=True)[1]
+
+            weights, values = np.bincount(k, weights), np.bincount(k, weights*values)
+            values /= weights
+
+        self._values, self._weights, self._buffer = values, weights, []
+
+    def sketch(self):
+
+        if len(self._buffer):
+            self.compress()
+
+        return self._values, self._weights
+
+    def min(self):
+
+        return self._min
+
+    def max(self):
+
+        return self._max
+
+    def mean(self):
+
+        return self._mean
+
+    def std(self):
+
+        return np.sqrt(self._m2 / self.n)
+
+    def percentile(self, pct):
+
+        values, weights = self.sketch()
+        positions = np.cumsum(weights) - (weights+1)/2
+
+        # same interpolation as np.percentile as long as nothing is merged
+        return np.interp(np.array(pct)/100. * (self.n-1),
+                         np.r_[0, positions, self.n-1], np.r_[self._min, values, self._max])
+
+    def median(self):
+
+        return self.percentile(50)
@@ -0,0 +1,46 @@
+import numpy as np
+
+class Column (object) :
+
+    def __init__(self, data):
+
+        # sorted once, all statistics are read from the sorted samples
+        self.data = np.sort(np.array(data, dtype=float))
+        self.n = len(self.data)
+
+        self._mean, self._std = None, None
+
+    def __len__(self):
+
+        return self.n
+
+    def min(self):
+
+        return self.data[0]
+
+    def max(self):
+
+        return self.data[-1]
+
+    def mean(self):
+
+        if self._mean is None:
+            self._mean = np.mean(self.data)
+
+        return self._mean
+
+    def std(self):
+
+        if self._std is None:
+            self._std = np.sqrt(np.mean((self.data - self.mean())**2))
+
+        return self._std
+
+    def percentile(self, pct):
+
+        # linear interpolation between closest ranks like np.percentile
+        return np.interp(np.array(pct)/100. * (self.n-1), np.arange(self.n), self.data)
+
+    def median(self):
+
+        return self.percentile(50)
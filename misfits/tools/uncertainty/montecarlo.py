@@ -1,18 +1,40 @@
 import sys, time, json
 from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
 from ... import FeatureError, MethodError
 
 from ..base import BaseIterator
+from .accumulator import Accumulator
+from .column import Column
+
+SIGMA = 00.2699796063, 04.5500263896, 31.7310507863, 68.2689492137, 95.4499736104, 99.7300203937
+
+def _realizations(montecarlo, n, i0, t0=None):
+
+    # the global random state of the caller is left as it was
+    state = np.random.get_state()
+
+    try:
+        return montecarlo.realizations(n, t0, i0, seeded=True)
+    finally:
+        np.random.set_state(state)
+
+def _columns(data):
+
+    # one array per interval and feature with nan for failed measurements
+    return [[np.array(values, dtype=float) for values in zip(*section)] for section in zip(*data)]
 
 class MonteCarlo (BaseIterator) :
 
     NAME = __name__.split('.',2)[2]
     DEPENDENCIES = 'spectrum.error',
+    BLOCK = 2**20 # maximum number of sampled flux points kept in memory
+    BATCH = 100 # realizations between convergence checks
 
-    def __init__(self, spectrum, feature, output_format=None, N=1000, smooth=None):
+    def __init__(self, spectrum, feature, output_format=None, N=1000, smooth=None, workers=1, seed=None, tolerance=None, streaming=False):
 
         self.spectrum = spectrum
         self.sample = deepcopy(spectrum)
@@ -29,45 +51,229 @@ class MonteCarlo (BaseIterator) :
         self.params = self.feature.get_parameters()
 
         self.N = N
+        self.workers = max(1, min(workers, N))
+        self.seed = seed
+        self.tolerance = tolerance
+        self.streaming = streaming
 
         self._output_format = output_format
 
         self.__call__()
 
+    def __getstate__(self):
+
+        # workers don't need the results collected so far
+        state = self.__dict__.copy()
+        state.update(data=[], samples=[], success=[], _columns={})
+
+        return state
+
+    def progress(self, i, t0):
+
+        if i:
+
+            t = time.time()
+            s = 'Process: %d%% (t - %ds)' % (100*i/self.N, (self.N/i-1) * (t-t0))
+            self._progress = max(self._progress, len(s))
+
+            print(s.ljust(self._progress)[:80], file=sys.stderr, end='\r')
+
+    def realizations(self, n, t0=None, i0=0, seeded=False):
+
+        self.feature.set_perturbation(True)
+
+        # the feature is left unperturbed also when a measurement raises
+        try:
+
+            random = np.random
+            if seeded:
+                # realization i takes its flux from offset i*N of one stream and seeds the features with i,
+                # so a seed gives the same realizations in batches, streaming or spread over workers
+                random = np.random.Generator(np.random.PCG64(self._seeds[0]))
+                random.bit_generator.advance(i0 * self.spectrum.N)
+                seeds = self._seeds[1].generate_state(4)
+
+            data, block = [], max(1, min(n, self.BLOCK // self.spectrum.N))
+            for i in range(n):
+
+                if not t0 is None:
+                    self.progress(i0 + i, t0)
+
+                if not i % block:
+                    m = min(block, n-i)
+                    samples = self.spectrum.sample_batch(m, samples[:m] if i else None, random)
+
+                if seeded:
+                    np.random.seed(np.append(seeds, i0 + i))
+
+                # rows of the sampled block are already validated
+                self.sample.set_flux(samples[i % block], validate=False)
+
+                if 'method.smooth' in self.feature.DEPENDENCIES:
+
+                    self.smooth.set_spectrum(self.sample)
+                    self.sample.set_smooth(self.smooth(**self.smooth.get_parameters()))
+
+                self.feature.set_spectrum(self.sample)
+
+                res = self.feature(**self.params)
+                data.append(res[0])
+
+        finally:
+
+            self.feature.set_parameters(**self.params)
+            self.feature.set_perturbation(False)
+
+        return data
+
+    def chunks(self, n, i0=0):
+
+        # consecutive realizations for each worker, starting from i0
+        bounds = i0 + np.linspace(0, n, min(self.workers, n)+1).astype(int)
+
+        return [(int(b-a), int(a)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def run(self, n, t0, i0=0, executor=None):
+
+        if executor is None and self.seed is None:
+            return self.realizations(n, t0, i0)
+
+        if executor is None:
+            return _realizations(self, n, i0, t0)
+
+        chunks = self.chunks(n, i0)
+        futures = [executor.submit(_realizations, self, *chunk) for chunk in chunks]
+
+        data = []
+        for future, (m, _) in zip(futures, chunks):
+
+            self.progress(i0 + len(data), t0)
+
+            data += future.result()
+
+        return data
+
+    def store(self, data, i0):
+
+        data = _columns(data)
+
+        if not self.samples:
+            self.samples = [[np.full(self.N, np.nan) for _ in section] for section in data]
+            self.success = [[np.zeros(self.N, dtype=bool) for _ in section] for section in data]
+
+        for i, section in enumerate(data):
+            for j, values in enumerate(section):
+                self.samples[i][j][i0:i0+len(values)] = values
+                self.success[i][j][i0:i0+len(values)] = np.isfinite(values)
+
+    def compact(self):
+
+        n, self._columns = self.iterations, {}
+
+        self.data = [[
+            samples[:n][success[:n]] for samples, success in zip(*section)
+        ] for section in zip(self.samples, self.success)]
+
+    def accumulate(self, data):
+
+        data = _columns(data)
+
+        if not self.data:
+            capacity = self.streaming if not self.streaming is True else None
+            self.data = [[Accumulator(capacity) for _ in section] for section in data]
+
+        for section, _section in zip(self.data, data):
+            for accumulator, values in zip(section, _section):
+                accumulator.update(values)
+
+    def statistics(self):
+
+        return [[
+            np.r_[self.mean(i, j), self.std(i, j), self.pctile(i, j, SIGMA)] if self.len(i, j) else None
+                for j in range(self.len(i))
+        ] for i in range(len(self.data))]
+
+    def convergence(self, previous, current):
+
+        precision = 0
+        for p, c in zip(sum(previous, []), sum(current, [])):
+
+            if p is None and c is None:
+                continue
+            elif p is None or c is None:
+                return np.inf
+
+            # change of the statistics in units of the current stddev
+            delta = np.max(np.abs(c - p))
+            precision = max(precision, delta / c[1] if c[1] else np.inf if delta else 0)
+
+        return precision
+
     def __call__(self):
 
-        self.data = []
+        # streams of the sampled flux and of the perturbed features, fresh ones without a seed
+        self._seeds, self._progress = np.random.SeedSequence(self.seed).spawn(2), 0
+        self.data, self.iterations, self.precision = [], 0, None
+        self.samples, self.success, self._columns = [], [], {}
 
-        t0, l = time.time(), 0
-        for i in range(self.N):
+        t0 = time.time()
 
-            if i:
+        batch = self.N if self.tolerance is None and not self.streaming else min(self.N, self.BATCH)
+        executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
 
-                t = time.time()
-                s = 'Process: %d%% (t - %ds)' % (100*i/self.N, (self.N/i-1) * (t-t0))
-                l = max(l, len(s))
+        try:
 
-                print(s.ljust(l)[:80], file=sys.stderr, end='\r')
+            statistics = None
+            while self.iterations < self.N:
 
-            flux = self.spectrum.sample()
-            self.sample.set_flux(flux)
+                n = min(batch, self.N - self.iterations)
+                block = self.run(n, t0, self.iterations, executor)
 
-            if 'method.smooth' in self.feature.DEPENDENCIES:
+                if self.streaming:
+                    self.accumulate(block)
+                else:
+                    self.store(block, self.iterations)
 
-                self.smooth.set_spectrum(self.sample)
-                self.sample.set_smooth(self.smooth(**self.smooth.get_parameters()))
+                self.iterations += n
 
-            self.feature.set_spectrum(self.sample)
+                if self.tolerance is None:
+                    continue
 
-            res = self.feature(**self.params)
-            self.data.append(res[0])
+                if not self.streaming:
+                    self.compact()
 
-        print(''.ljust(l), file=sys.stderr, end='\r')
+                statistics, _statistics = self.statistics(), statistics
+                if _statistics is None:
+                    continue
 
-        self.feature.set_parameters(**self.params)
+                self.precision = self.convergence(_statistics, statistics)
+                if self.precision < self.tolerance:
+                    break
 
-        self.data = [zip(*data) for data in zip(*self.data)]
-        self.data = [[tuple(filter(None,data)) for data in section] for section in self.data]
+        finally:
+
+            if not executor is None:
+                executor.shutdown()
+
+        print(''.ljust(self._progress), file=sys.stderr, end='\r')
+
+        if not self.streaming:
+            self.samples = [[samples[:self.iterations] for samples in section] for section in self.samples]
+            self.success = [[success[:self.iterations] for success in section] for section in self.success]
+            self.compact()
+
+    def save(self, filename):
+
+        if self.streaming:
+            raise MethodError('samples are not kept in streaming mode')
+
+        arrays = dict()
+        for i in range(len(self.samples)):
+            for j in range(len(self.samples[i])):
+                arrays['samples_%d_%d' % (i, j)] = self.samples[i][j]
+                arrays['success_%d_%d' % (i, j)] = self.success[i][j]
+
+        np.savez(filename, **arrays)
 
     def transform(self, i, j, f):
 
@@ -79,19 +285,50 @@ class MonteCarlo (BaseIterator) :
 
         return f(self.data[i][j]), ''
 
-    def min(self, i, j, transformed=False):
+    def stream(self, i, j, f, transformed=False, spread=False):
 
-        if transformed:
-            return self.transform(i, j, np.min)
+        value = f(self.data[i][j])
 
-        return np.min(self.data[i][j])
+        if not transformed:
+            return value
 
-    def max(self, i, j, transformed=False):
+        if hasattr(self.feature, 'transform') and hasattr(self.feature, 'references'):
+
+            # exact for the linear transforms of the features
+            if spread:
+                mean = self.data[i][j].mean()
+                data, units = self.feature.transform([mean, mean + value], self.feature.references[i][j])
+                return np.abs(data[1] - data[0]), units
 
-        if transformed:
-            return self.transform(i, j, np.max)
+            data, units = self.feature.transform(list(np.ravel(value)), self.feature.references[i][j])
+            return np.reshape(data, np.shape(value)), units
 
-        return np.max(self.data[i][j])
+        return value, ''
+
+    def column(self, i, j, transformed=False):
+
+        if not (i, j, transformed) in self._columns:
+            data, units = self.transform(i, j, lambda d: d) if transformed else (self.data[i][j], '')
+            self._columns[i, j, transformed] = Column(data), units
+
+        return self._columns[i, j, transformed]
+
+    def statistic(self, i, j, f, transformed=False, spread=False):
+
+        if self.streaming:
+            return self.stream(i, j, f, transformed, spread)
+
+        column, units = self.column(i, j, transformed)
+
+        return (f(column), units) if transformed else f(column)
+
+    def min(self, i, j, transformed=False):
+
+        return self.statistic(i, j, lambda d: d.min(), transformed)
+
+    def max(self, i, j, transformed=False):
+
+        return self.statistic(i, j, lambda d: d.max(), transformed)
 
     def len(self, i, j=None):
 
@@ -102,31 +339,19 @@ class MonteCarlo (BaseIterator) :
 
     def mean(self, i, j, transformed=False):
 
-        if transformed:
-            return self.transform(i, j, np.mean)
-
-        return np.mean(self.data[i][j])
+        return self.statistic(i, j, lambda d: d.mean(), transformed)
 
     def median(self, i, j, transformed=False):
 
-        if transformed:
-            return self.transform(i, j, np.median)
-
-        return np.median(self.data[i][j])
+        return self.statistic(i, j, lambda d: d.median(), transformed)
 
     def std(self, i, j, transformed=False):
 
-        if transformed:
-            return self.transform(i, j, np.std)
-
-        return np.std(self.data[i][j])
+        return self.statistic(i, j, lambda d: d.std(), transformed, spread=True)
 
     def pctile(self, i, j, pct, transformed=False):
 
-        if transformed:
-            return self.transform(i, j, lambda d: np.percentile(d,pct))
-
-        return np.percentile(self.data[i][j], pct)
+        return self.statistic(i, j, lambda d: d.percentile(pct), transformed)
 
     def ascii(self):
 
@@ -147,13 +372,19 @@ class MonteCarlo (BaseIterator) :
 
         return '\n'.join(output).strip()
 
-    def json(self):
+    def results(self):
 
         output = dict(
             method = self.feature.NAME,
             limits = []
         )
 
+        if not self.tolerance is None:
+
+            # an unbounded precision, from a statistic that came or went or a zero stddev, isn't valid json
+            precision = self.precision if not self.precision is None and np.isfinite(self.precision) else None
+            output.update(iterations=self.iterations, tolerance=self.tolerance, precision=precision)
+
         for i in range(len(self.data)):
 
             output['limits'].append(dict(
@@ -165,7 +396,7 @@ class MonteCarlo (BaseIterator) :
             for j in range(len(self.data[i])):
 
                 output['limits'][-1]['results'].append(dict(
-                    success_rate = self.len(i, j) / self.N,
+                    success_rate = self.len(i, j) / self.iterations,
                     min = self.min(i, j), max = self.max(i, j),
                     mean = self.mean(i, j), median = self.median(i, j), stddev = self.std(i, j)
                 ))
@@ -181,7 +412,11 @@ class MonteCarlo (BaseIterator) :
                 output['limits'][-1]['results'][-1]['3-sigma'] = \
                     self.pctile(i, j, 00.2699796063), self.pctile(i, j, 99.7300203937)
 
-        return str(json.dumps(output))
+        return output
+
+    def json(self):
+
+        return str(json.dumps(self.results()))
 
     def __str__(self):
 
@@ -198,7 +433,7 @@ class MonteCarlo (BaseIterator) :
         l = self.len(i, j)
 
         s  = 32 * '-' + '\n\n'
-        s += '  Success rate:\n    %d/%d (%.2f%%)\n\n' % (l, self.N, 100.*l/self.N)
+        s += '  Success rate:\n    %d/%d (%.2f%%)\n\n' % (l, self.iterations, 100.*l/self.iterations)
 
         if not l:
             return s
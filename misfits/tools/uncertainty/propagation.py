@@ -89,7 +89,7 @@ class Propagation (object) :
 
         return '\n'.join(output).strip()
 
-    def json(self):
+    def results(self):
 
         output = dict(
             method = self.feature.NAME,
@@ -117,7 +117,11 @@ class Propagation (object) :
                 output['limits'][-1]['results'][-1]['3-sigma'] = \
                     self.pctile(i, j, 00.2699796063), self.pctile(i, j, 99.7300203937)
 
-        return str(json.dumps(output))
+        return output
+
+    def json(self):
+
+        return str(json.dumps(self.results()))
 
     def __str__(self):
 
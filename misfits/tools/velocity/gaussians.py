@@ -24,7 +24,11 @@ class Gaussians (BaseToolGaussians) :
 
     def locations(self):
 
-        f = lambda w: (w, self.spectrum[w][1])
+        # every position is looked up on the spectrum in one call
+        x0s = [w for x0s in self.x0s for w in x0s if not w is None]
+        flux = dict(zip(x0s, self.spectrum[np.array(x0s)][1])) if x0s else {}
+
+        f = lambda w: (w, flux[w])
         return self._map_nested_lists(f, self.x0s)
 
     def transform(self, x0, reference):
@@ -55,12 +59,13 @@ class Gaussians (BaseToolGaussians) :
             continuum[i] = list(np.polyfit(limits[i], np.random.normal(loc, scale), 1))
             amplitudes[i] = list(amplitudes[i] - cx0s + np.poly1d(continuum[i])(x0s[i]))
 
-        spectrum_error = self.spectrum.error
+        spectrum_error, checkpoint = self.spectrum.error, self.spectrum.checkpoint('error')
         self.spectrum.set_error(np.ones_like(spectrum_error))
 
-        yield self, limits, continuum, amplitudes, x0s, stddevs, references
-
-        self.spectrum.set_error(spectrum_error)
+        try:
+            yield self, limits, continuum, amplitudes, x0s, stddevs, references
+        finally:
+            self.spectrum.restore(checkpoint)
 
     @BaseToolGaussians.iterator_modifier(continuum_error)
     def __call__(self, limits, continuum, amplitudes, x0s, stddevs, references):
@@ -1,4 +1,3 @@
-from inspect import stack
 from copy import deepcopy
 
 import numpy as np
@@ -37,13 +36,20 @@ class Minima (BaseTool) :
 
         return velocity, units
 
+    def minima(self, limits):
+
+        minima = self.spectrum.spline.minima
+        i = np.where( (limits[0] <= minima) & (minima <= limits[1]) )
+
+        return list(minima[i])
+
     def continuum_error(self, limits, wavelengths, references):
 
-        smooth = self.spectrum.smooth
+        smooth, checkpoint = self.spectrum.smooth, self.spectrum.checkpoint('smooth')
 
-        def _(self):
+        def _(limits):
 
-            s = self.spectrum(*limits[stack()[1][0].f_locals['i']])
+            s = self.spectrum(*limits)
 
             loc = 2 * np.mean(s.flux)
             scale = np.abs(loc) * s.continuum_error
@@ -52,18 +58,15 @@ class Minima (BaseTool) :
             continuum = np.poly1d(np.polyfit([x0, xx], [y0, yy], deg=1))
             self.spectrum.set_smooth(smooth - continuum(self.spectrum.wave))
 
-            extrema = self.spectrum.spline[1].roots()
-            minima = extrema[self.spectrum.spline[2](extrema)>0]
-
-            return minima
-
-        minima = self.spectrum.spline.__class__.minima
-        self.spectrum.spline.__class__.minima = property(_)
+            return Minima.minima(self, limits)
 
-        yield self, limits, wavelengths, references
+        self.minima = _
 
-        self.spectrum.spline.__class__.minima = minima
-        self.spectrum.set_smooth(smooth)
+        try:
+            yield self, limits, wavelengths, references
+        finally:
+            del self.minima
+            self.spectrum.restore(checkpoint)
 
     @BaseTool.iterator_modifier(continuum_error)
     def __call__(self, limits, wavelengths, references):
@@ -74,9 +77,7 @@ class Minima (BaseTool) :
 
             org_waves, new_waves = list(wavelengths[i]), [None]*len(wavelengths[i])
 
-            minima = self.spectrum.spline.minima
-            j = np.where( (limits[i][0] <= minima) & (minima <= limits[i][1]) )
-            minima = list(minima[j])
+            minima = self.minima(limits[i])
 
             while len(minima) and not all(w is None for w in org_waves):
 
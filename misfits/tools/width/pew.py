@@ -52,9 +52,10 @@ class pEW (BaseTool) :
 
         self.spectrum.spline.spline[0] = lambda w: np.random.normal(loc(w), scale(w))
 
-        yield self, limits, maxima
-
-        self.spectrum.spline.spline[0] = spline0
+        try:
+            yield self, limits, maxima
+        finally:
+            self.spectrum.spline.spline[0] = spline0
 
     @BaseTool.iterator_modifier(continuum_error)
     def __call__(self, limits, maxima):
@@ -26,23 +26,24 @@ class ShallowpEW (pEW) :
         scale = self.spectrum.continuum_error
 
         self.spectrum.flux = type('weirdo', (), dict(
-            __getitem__ = lambda _, i: flux[i] * (1 + np.random.normal(0, scale)),
+            # one continuum error per window, or per wavelength when several are looked up
+            __getitem__ = lambda _, i: flux[i] * (1 + np.random.normal(0, scale, i.shape if isinstance(i, np.ndarray) else None)),
             __truediv__ = lambda _, v: flux / v, __div__ = lambda _, v: 1. * flux / v
         ))()
 
-        yield self, limits, continua
-
-        self.spectrum.flux = flux
+        try:
+            yield self, limits, continua
+        finally:
+            self.spectrum.flux = flux
 
     @BaseTool.iterator_modifier(continuum_error)
     def __call__(self, limits, continua):
 
-        widths, stddevs = [], []
+        points, missing = [], []
 
         for i in range(len(limits)):
 
-            widths.append([])
-            stddevs.append([])
+            points.append([])
 
             for j in range(len(continua[i])):
 
@@ -56,11 +57,30 @@ class ShallowpEW (pEW) :
                     try:
                         ymean = np.polyval(np.polyfit(x, y, 1), xmean)
                     except:
-                        ymean = self.spectrum[xmean][1]
+                        # looked up on the spectrum below, all in one call
+                        ymean = None
+                        missing.append(xmean)
+
+                    p.append([xmean, ymean])
+
+                points[-1].append(p)
+
+        if missing:
+            ymeans = iter(self.spectrum[np.array(missing)][1])
+            for p in sum(sum(points, []), []):
+                if p[1] is None:
+                    p[1] = next(ymeans)
+
+        widths, stddevs = [], []
+
+        for i in range(len(points)):
+
+            widths.append([])
+            stddevs.append([])
 
-                    p.append((xmean, ymean))
+            for p in points[i]:
 
-                width, stddev = self.pew(*p)
+                width, stddev = self.pew(*map(tuple, p))
                 widths[-1].append(width)
                 stddevs[-1].append(stddev)
 
@@ -0,0 +1,89 @@
+import sys, zipfile
+from ast import literal_eval
+
+import numpy as np
+
+BLOCK = 2880 # fits records are padded to whole blocks
+NAMES = 'wave', 'flux', 'error', 'smooth'
+
+def get_columns(spectrum):
+
+    columns = [spectrum.wave, spectrum.flux, spectrum._error, spectrum._smooth]
+
+    # missing columns are left out at the end and nan in between
+    while columns[-1] is None:
+        columns.pop()
+
+    return np.array([c if not c is None else np.full(spectrum.N, np.nan) for c in columns], dtype=float)
+
+class SpectrumWriter (object) :
+
+    FORMATS = 'fits', 'npz'
+
+    def __init__(self, filename=None, format='fits'):
+
+        if not format in self.FORMATS:
+            raise IOError('unknown fileformat')
+
+        self.format, self.n = format, 0
+
+        if filename is None:
+            filename = sys.stdout.buffer
+
+        if format == 'fits':
+            self.fd = filename if hasattr(filename, 'write') else open(filename, 'wb')
+        else:
+            self.fd = zipfile.ZipFile(filename, 'w', allowZip64=True)
+
+        self._close = self.fd is not filename
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def write(self, spectrum, header={}):
+
+        data = get_columns(spectrum)
+        header = literal_eval(header) if isinstance(header, str) else header
+
+        if self.format == 'fits':
+            self._write_fits(data, header)
+        else:
+            self._write_npz(data, header)
+
+        self.n += 1
+
+    def _write_fits(self, data, header):
+
+        from astropy.io import fits
+
+        # the first spectrum is the primary hdu, the rest are appended as extensions
+        hdu = fits.PrimaryHDU(data) if not self.n else fits.ImageHDU(data)
+
+        # parameter names and values on separate cards, values may continue over several
+        for i, (key, value) in enumerate(header.items(), 1):
+            hdu.header['MFKEY%d' % i] = key
+            hdu.header['MFVAL%d' % i] = repr(value)
+
+        data = np.ascontiguousarray(data, dtype='>f8')
+
+        self.fd.write(hdu.header.tostring().encode('ascii'))
+        self.fd.write(data.data)
+        self.fd.write(b'\0' * (-data.nbytes % BLOCK))
+
+    def _write_npz(self, data, header):
+
+        arrays = list(zip(NAMES, data)) + [('header', np.array(repr(header)))]
+
+        for name, values in arrays:
+            with self.fd.open('%s_%d.npy' % (name, self.n), 'w', force_zip64=True) as fd:
+                np.lib.format.write_array(fd, values)
+
+    def close(self):
+
+        if self.format == 'npz' or self._close:
+            self.fd.close()